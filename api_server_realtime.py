@@ -11,10 +11,22 @@ from pydantic import BaseModel
 from typing import Dict, Any, Optional, AsyncGenerator
 import asyncio
 import json
+import logging
 import os
+import queue
 from datetime import datetime
+from logging.handlers import QueueHandler, QueueListener
 import uvicorn
 
+# Route orchestrator/memory manager log records to the console through a queue, so
+# request handlers never block on console writes (a listener thread does them)
+_log_queue: queue.SimpleQueue = queue.SimpleQueue()
+_console_handler = logging.StreamHandler()
+_console_handler.setFormatter(logging.Formatter("%(message)s"))
+log_listener = QueueListener(_log_queue, _console_handler)
+logging.basicConfig(level=os.getenv("LOG_LEVEL", "INFO").upper(), handlers=[QueueHandler(_log_queue)])
+log_listener.start()
+
 # LAZY IMPORTS - these will be imported only when needed
 # from orchestrator import AutoInsuranceOrchestrator, ClaimData
 # from blob_service import get_blob_service
@@ -44,7 +56,10 @@ async def get_orchestrator():
             if orchestrator is None:  # Double-check after acquiring lock
                 print("🔄 Importing and initializing orchestrator on first request...")
                 from orchestrator import AutoInsuranceOrchestrator
+                from orchestrator.orchestrator import configure_executor
+                configure_executor()
                 orchestrator = AutoInsuranceOrchestrator()
+                await orchestrator.memory_manager.connect()
                 print("✅ Real-Time Orchestrator initialized successfully")
     return orchestrator
 
@@ -55,11 +70,28 @@ async def lifespan(app: FastAPI):
     # Startup - just log, don't initialize orchestrator yet
     print("🚀 App starting up - orchestrator will be initialized on first request")
     
+    # Optionally initialize and warm up in the background so the first claim skips the cold start
+    warmup_task = None
+    if os.getenv("WARMUP_ON_STARTUP", "false").lower() == "true":
+        async def warmup():
+            try:
+                orch = await get_orchestrator()
+                await orch.synthesis_engine.warmup()
+            except Exception as e:
+                print(f"⚠️ Startup warmup failed: {e}")
+        warmup_task = asyncio.create_task(warmup())
+    
     yield  # Application runs here
     
+    if warmup_task and not warmup_task.done():
+        warmup_task.cancel()
+    
     # Shutdown
     if orchestrator:
+        await orchestrator.flush_audit_log()
+        await orchestrator.memory_manager.close()
         orchestrator.cleanup()
+    log_listener.stop()
 
 app = FastAPI(
     title="Auto Insurance Claim API - Real-Time",
@@ -89,12 +121,34 @@ class ClaimRequest(BaseModel):
 
 class StreamMessage(BaseModel):
     """Message structure for SSE streaming"""
-    type: str  # "agent_start" | "agent_complete" | "agent_error" | "final_complete" | "error"
+    type: str  # "agent_start" | "agent_progress" | "agent_complete" | "agent_error" | "final_complete" | "error"
     agent_name: str
     claim_id: str
     timestamp: str
     data: Optional[Dict[str, Any]] = None
 
+class AgentResponse(BaseModel):
+    """Single agent result returned by the batch endpoint"""
+    agent_name: str
+    status: str
+    response: str
+    timestamp: str
+    processing_time_seconds: Optional[float] = None
+
+class BatchClaimResponse(BaseModel):
+    """Complete claim result returned by the batch endpoint"""
+    claim_id: str
+    overall_status: str
+    processing_started: str
+    processing_completed: str
+    total_processing_time_seconds: float
+    policy_basic_details: Optional[AgentResponse] = None
+    policy_analysis: Optional[AgentResponse] = None
+    inspection_analysis: Optional[AgentResponse] = None
+    bill_analysis: Optional[AgentResponse] = None
+    final_recommendation: Optional[AgentResponse] = None
+    summary: Dict[str, Any]
+
 
 def create_sse_message(message: StreamMessage) -> str:
     """Format message for Server-Sent Events"""
@@ -379,18 +433,35 @@ async def process_claim_stream(claim_id: str, claim_description: str) -> AsyncGe
             else:
                 print("⚠️ WARNING: Bill data NOT found in memory!")
             
-            # Synthesize final recommendation with keepalive
-            task = asyncio.create_task(orch.synthesize_final_recommendation(claim_data))
-            while not task.done():
-                try:
-                    final_result = await asyncio.wait_for(asyncio.shield(task), timeout=8.0)
+            # Synthesize final recommendation, streaming the decision text as it is
+            # generated (agent_progress) and sending keepalives while nothing arrives
+            chunks: asyncio.Queue = asyncio.Queue()
+            task = asyncio.create_task(orch.synthesize_final_recommendation(claim_data, chunks.put_nowait))
+            next_chunk = None
+            while True:
+                if next_chunk is None:
+                    next_chunk = asyncio.ensure_future(chunks.get())
+                done, _ = await asyncio.wait({next_chunk, task}, timeout=8.0, return_when=asyncio.FIRST_COMPLETED)
+                if next_chunk in done:
+                    deltas = [next_chunk.result()]
+                    next_chunk = None
+                    while not chunks.empty():
+                        deltas.append(chunks.get_nowait())
+                    yield create_sse_message(StreamMessage(
+                        type="agent_progress",
+                        agent_name=AGENT_NAMES["FINAL_DECISION"],
+                        claim_id=claim_id,
+                        timestamp=datetime.now().isoformat(),
+                        data={"step": 4, "delta": "".join(deltas)}
+                    ))
+                elif task in done:
+                    next_chunk.cancel()
                     break
-                except asyncio.TimeoutError:
+                else:
                     yield create_keepalive()
                     print(f"💓 Keepalive sent for final decision agent")
             
-            if task.done():
-                final_result = task.result()
+            final_result = task.result()
             
             processing_time = (datetime.now() - start_time).total_seconds()
             
@@ -470,29 +541,6 @@ async def process_claim_batch(request: ClaimRequest):
     """
     orch = await get_orchestrator()
     
-    from pydantic import BaseModel
-    from typing import Optional
-    
-    class AgentResponse(BaseModel):
-        agent_name: str
-        status: str
-        response: str
-        timestamp: str
-        processing_time_seconds: Optional[float] = None
-    
-    class BatchClaimResponse(BaseModel):
-        claim_id: str
-        overall_status: str
-        processing_started: str
-        processing_completed: str
-        total_processing_time_seconds: float
-        policy_basic_details: Optional[AgentResponse] = None
-        policy_analysis: Optional[AgentResponse] = None
-        inspection_analysis: Optional[AgentResponse] = None
-        bill_analysis: Optional[AgentResponse] = None
-        final_recommendation: Optional[AgentResponse] = None
-        summary: Dict[str, Any]
-    
     start_time = datetime.now()
     print(f"\n🚀 Batch API: Processing claim {request.claim_id}")
     
@@ -506,45 +554,50 @@ async def process_claim_batch(request: ClaimRequest):
             summary={}
         )
         
-        # Agent 1: Policy Basic Details
-        try:
-            policy_start = datetime.now()
-            basic_details = await orch.get_policy_basic_details(request.claim_id)
-            policy_time = (datetime.now() - policy_start).total_seconds()
-            response.policy_basic_details = AgentResponse(
-                agent_name="Policy Lookup Assistant",
-                status="completed",
-                response=basic_details,
-                timestamp=datetime.now().isoformat(),
-                processing_time_seconds=policy_time
-            )
-        except Exception as e:
-            response.policy_basic_details = AgentResponse(
-                agent_name="Policy Lookup Assistant",
-                status="failed",
-                response=f"Error: {str(e)}",
-                timestamp=datetime.now().isoformat()
-            )
-        
-        # Agent 2: Policy Analysis
-        try:
-            policy_start = datetime.now()
-            policy_result = await orch.execute_policy_analysis(request.claim_description, request.claim_id)
-            policy_time = (datetime.now() - policy_start).total_seconds()
-            response.policy_analysis = AgentResponse(
-                agent_name="Policy Coverage Assistant",
-                status="completed",
-                response=policy_result,
-                timestamp=datetime.now().isoformat(),
-                processing_time_seconds=policy_time
-            )
-        except Exception as e:
-            response.policy_analysis = AgentResponse(
-                agent_name="Policy Coverage Assistant",
-                status="failed",
-                response=f"Error: {str(e)}",
-                timestamp=datetime.now().isoformat()
-            )
+        # Agents 1 and 2 depend only on the claim itself, so run them concurrently
+        async def run_policy_basic_details():
+            """Agent 1: Policy Basic Details"""
+            try:
+                policy_start = datetime.now()
+                basic_details = await orch.get_policy_basic_details(request.claim_id)
+                policy_time = (datetime.now() - policy_start).total_seconds()
+                response.policy_basic_details = AgentResponse(
+                    agent_name="Policy Lookup Assistant",
+                    status="completed",
+                    response=basic_details,
+                    timestamp=datetime.now().isoformat(),
+                    processing_time_seconds=policy_time
+                )
+            except Exception as e:
+                response.policy_basic_details = AgentResponse(
+                    agent_name="Policy Lookup Assistant",
+                    status="failed",
+                    response=f"Error: {str(e)}",
+                    timestamp=datetime.now().isoformat()
+                )
+        
+        async def run_policy_analysis():
+            """Agent 2: Policy Analysis"""
+            try:
+                policy_start = datetime.now()
+                policy_result = await orch.execute_policy_analysis(request.claim_description, request.claim_id)
+                policy_time = (datetime.now() - policy_start).total_seconds()
+                response.policy_analysis = AgentResponse(
+                    agent_name="Policy Coverage Assistant",
+                    status="completed",
+                    response=policy_result,
+                    timestamp=datetime.now().isoformat(),
+                    processing_time_seconds=policy_time
+                )
+            except Exception as e:
+                response.policy_analysis = AgentResponse(
+                    agent_name="Policy Coverage Assistant",
+                    status="failed",
+                    response=f"Error: {str(e)}",
+                    timestamp=datetime.now().isoformat()
+                )
+        
+        await asyncio.gather(run_policy_basic_details(), run_policy_analysis())
         
         # Agent 3: Inspection Analysis
         try:
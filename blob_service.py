@@ -1,14 +1,15 @@
 """
 Azure Blob Storage Service for Vehicle Insurance Claims
 Provides document management functionality for claim processing
-Uses Managed Identity (DefaultAzureCredential) for authentication
+Uses Managed Identity (DefaultAzureCredential) for authentication,
+or keys when USE_MANAGED_IDENTITY=false
 """
 
 import os
 from typing import List, Dict, Any, Optional
 from datetime import datetime, timedelta, timezone
 from dotenv import load_dotenv
-from azure.storage.blob import BlobServiceClient, BlobSasPermissions
+from azure.storage.blob import BlobServiceClient, BlobSasPermissions, ContentSettings, generate_blob_sas
 from azure.identity import DefaultAzureCredential
 
 # Load environment variables
@@ -18,27 +19,59 @@ load_dotenv()
 STORAGE_ACCOUNT_NAME = os.getenv("AZURE_STORAGE_ACCOUNT_NAME") or os.getenv("STORAGE_ACCOUNT_NAME")
 CONTAINER_NAME = os.getenv("AZURE_STORAGE_CONTAINER_NAME") or os.getenv("CONTAINER_NAME", "vehicle-insurance")
 
+# Key-based authentication (USE_MANAGED_IDENTITY=false)
+USE_MANAGED_IDENTITY = os.getenv("USE_MANAGED_IDENTITY", "true").lower() != "false"
+STORAGE_CONNECTION_STRING = os.getenv("AZURE_STORAGE_CONNECTION_STRING")
+STORAGE_ACCOUNT_KEY = os.getenv("AZURE_STORAGE_ACCOUNT_KEY") or os.getenv("STORAGE_ACCOUNT_KEY")
+
+# A fetched user delegation key outlives the SAS it was requested for by this much,
+# so SAS URLs generated shortly afterwards reuse it (the service caps keys at 7 days)
+DELEGATION_KEY_EXTRA_LIFETIME = timedelta(hours=1)
+MAX_DELEGATION_KEY_LIFETIME = timedelta(days=7)
+
 
 class BlobStorageService:
     """Service for managing documents in Azure Blob Storage using Managed Identity"""
     
     def __init__(self):
-        """Initialize the blob storage service with Managed Identity"""
-        if not STORAGE_ACCOUNT_NAME:
-            raise ValueError("AZURE_STORAGE_ACCOUNT_NAME not found in environment variables")
-        
-        self.account_name = STORAGE_ACCOUNT_NAME
+        """Initialize the blob storage service with Managed Identity (or keys if disabled)"""
         self.container_name = CONTAINER_NAME
-        self.account_url = f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net"
+        # Set in key-based mode; SAS URLs are then signed with the account key
+        self.account_key = None
+        
+        if not USE_MANAGED_IDENTITY and STORAGE_CONNECTION_STRING:
+            self.credential = None
+            self.blob_service_client = BlobServiceClient.from_connection_string(STORAGE_CONNECTION_STRING)
+            self.account_key = getattr(self.blob_service_client.credential, "account_key", None)
+            auth_method = "connection string"
+        else:
+            if not STORAGE_ACCOUNT_NAME:
+                raise ValueError("AZURE_STORAGE_ACCOUNT_NAME not found in environment variables")
+            account_url = f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net"
+            if not USE_MANAGED_IDENTITY:
+                if not STORAGE_ACCOUNT_KEY:
+                    raise ValueError(
+                        "USE_MANAGED_IDENTITY=false requires AZURE_STORAGE_CONNECTION_STRING or AZURE_STORAGE_ACCOUNT_KEY"
+                    )
+                self.credential = None
+                self.account_key = STORAGE_ACCOUNT_KEY
+                self.blob_service_client = BlobServiceClient(account_url=account_url, credential=STORAGE_ACCOUNT_KEY)
+                auth_method = "account key"
+            else:
+                # Use DefaultAzureCredential for Managed Identity authentication
+                self.credential = DefaultAzureCredential()
+                self.blob_service_client = BlobServiceClient(
+                    account_url=account_url,
+                    credential=self.credential
+                )
+                auth_method = "Managed Identity"
         
-        # Use DefaultAzureCredential for Managed Identity authentication
-        self.credential = DefaultAzureCredential()
-        self.blob_service_client = BlobServiceClient(
-            account_url=self.account_url,
-            credential=self.credential
-        )
+        self.account_name = self.blob_service_client.account_name
+        self.account_url = self.blob_service_client.url.rstrip("/")
         self.container_client = self.blob_service_client.get_container_client(self.container_name)
-        print(f"[OK] Blob Storage initialized with Managed Identity for account: {STORAGE_ACCOUNT_NAME}")
+        self._user_delegation_key = None
+        self._user_delegation_key_expiry = None
+        print(f"[OK] Blob Storage initialized with {auth_method} for account: {self.account_name}")
     
     def list_all_documents(self) -> List[Dict[str, Any]]:
         """
@@ -143,8 +176,6 @@ class BlobStorageService:
         Returns:
             SAS URL string
         """
-        from azure.storage.blob import generate_blob_sas, UserDelegationKey
-        
         try:
             # If document_name already contains a path (has '/'), use it directly
             # Otherwise, construct path with claim_id
@@ -155,31 +186,28 @@ class BlobStorageService:
             else:
                 blob_name = document_name
             
-            # Get user delegation key for SAS token generation with Managed Identity
             start_time = datetime.now(timezone.utc)
             expiry_time = start_time + timedelta(hours=expiry_hours)
             
-            user_delegation_key = self.blob_service_client.get_user_delegation_key(
-                key_start_time=start_time,
-                key_expiry_time=expiry_time
-            )
+            if self.account_key:
+                # Key-based mode: sign with the account key
+                signing_key = {"account_key": self.account_key}
+            else:
+                # Get user delegation key for SAS token generation with Managed Identity
+                signing_key = {"user_delegation_key": self._get_user_delegation_key(start_time, expiry_time)}
             
-            # Generate SAS token using user delegation key
             sas_token = generate_blob_sas(
                 account_name=self.account_name,
                 container_name=self.container_name,
                 blob_name=blob_name,
-                user_delegation_key=user_delegation_key,
                 permission=BlobSasPermissions(read=True),
                 expiry=expiry_time,
-                start=start_time
+                start=start_time,
+                **signing_key
             )
             
             # Construct the full URL
-            blob_url = (
-                f"https://{self.account_name}.blob.core.windows.net/"
-                f"{self.container_name}/{blob_name}?{sas_token}"
-            )
+            blob_url = f"{self.account_url}/{self.container_name}/{blob_name}?{sas_token}"
             
             return blob_url
             
@@ -187,6 +215,24 @@ class BlobStorageService:
             print(f"Error generating SAS URL for {document_name}: {e}")
             raise
     
+    def _get_user_delegation_key(self, start_time: datetime, expiry_time: datetime):
+        """
+        Return a user delegation key valid until at least expiry_time,
+        reusing the cached key instead of calling the service for every SAS URL
+        """
+        if self._user_delegation_key_expiry is None or self._user_delegation_key_expiry < expiry_time:
+            key_expiry = min(
+                expiry_time + DELEGATION_KEY_EXTRA_LIFETIME,
+                start_time + MAX_DELEGATION_KEY_LIFETIME
+            )
+            self._user_delegation_key = self.blob_service_client.get_user_delegation_key(
+                key_start_time=start_time,
+                key_expiry_time=key_expiry
+            )
+            self._user_delegation_key_expiry = key_expiry
+        
+        return self._user_delegation_key
+    
     def upload_document(
         self, 
         claim_id: str, 
@@ -216,7 +262,6 @@ class BlobStorageService:
             # Upload with content type if provided
             content_settings = None
             if content_type:
-                from azure.storage.blob import ContentSettings
                 content_settings = ContentSettings(content_type=content_type)
             
             blob_client.upload_blob(
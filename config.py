@@ -13,6 +13,13 @@ load_dotenv()
 class Config:
     """Central configuration class for the application"""
     
+    # ============================================================
+    # Authentication Mode
+    # ============================================================
+    # Managed Identity is the default; set USE_MANAGED_IDENTITY=false to
+    # authenticate Cosmos DB and Blob Storage with keys instead
+    USE_MANAGED_IDENTITY: bool = os.getenv("USE_MANAGED_IDENTITY", "true").lower() != "false"
+    
     # ============================================================
     # Azure AI Project Configuration
     # ============================================================
@@ -34,6 +41,7 @@ class Config:
     COSMOS_DB_ENDPOINT: str = os.getenv("COSMOS_DB_ENDPOINT", "")
     COSMOS_DB_DATABASE_NAME: str = os.getenv("COSMOS_DB_DATABASE_NAME", "insurance")
     COSMOS_DB_CONTAINER_NAME: str = os.getenv("COSMOS_DB_CONTAINER_NAME", "data")
+    COSMOS_DB_KEY: Optional[str] = os.getenv("COSMOS_DB_KEY") or None
     
     # ============================================================
     # Azure AI Search Configuration
@@ -45,10 +53,12 @@ class Config:
     BILL_INDEX_NAME: str = os.getenv("BILL_INDEX_NAME", "bill")
     
     # ============================================================
-    # Azure Blob Storage Configuration (uses Managed Identity)
+    # Azure Blob Storage Configuration
     # ============================================================
     AZURE_STORAGE_ACCOUNT_NAME: str = os.getenv("AZURE_STORAGE_ACCOUNT_NAME", "")
     AZURE_STORAGE_CONTAINER_NAME: str = os.getenv("AZURE_STORAGE_CONTAINER_NAME", "vehicle-insurance")
+    AZURE_STORAGE_ACCOUNT_KEY: Optional[str] = os.getenv("AZURE_STORAGE_ACCOUNT_KEY") or None
+    AZURE_STORAGE_CONNECTION_STRING: Optional[str] = os.getenv("AZURE_STORAGE_CONNECTION_STRING") or None
     
     # ============================================================
     # Audit API Configuration
@@ -65,7 +75,8 @@ class Config:
     def validate_required_config(cls) -> list[str]:
         """
         Validate that all required configuration values are set.
-        Uses Managed Identity for authentication - only endpoints are required.
+        With Managed Identity only endpoints are required; key-based mode
+        also requires the Cosmos DB key and storage credentials.
         Returns a list of missing configuration keys.
         """
         missing_configs = []
@@ -78,16 +89,23 @@ class Config:
             ("AZURE_PROJECT_NAME", cls.AZURE_PROJECT_NAME),
         ]
         
-        # Required Cosmos DB configs (endpoint only - uses Managed Identity)
+        # Required Cosmos DB configs (endpoint only with Managed Identity)
         required_cosmos_configs = [
             ("COSMOS_DB_ENDPOINT", cls.COSMOS_DB_ENDPOINT),
         ]
         
-        # Required Storage configs (account name only - uses Managed Identity)
+        # Required Storage configs (account name only with Managed Identity)
         required_storage_configs = [
             ("AZURE_STORAGE_ACCOUNT_NAME", cls.AZURE_STORAGE_ACCOUNT_NAME),
         ]
         
+        if not cls.USE_MANAGED_IDENTITY:
+            required_cosmos_configs.append(("COSMOS_DB_KEY", cls.COSMOS_DB_KEY))
+            if cls.AZURE_STORAGE_CONNECTION_STRING:
+                required_storage_configs = []
+            else:
+                required_storage_configs.append(("AZURE_STORAGE_ACCOUNT_KEY", cls.AZURE_STORAGE_ACCOUNT_KEY))
+        
         for config_name, config_value in required_azure_configs + required_cosmos_configs + required_storage_configs:
             if not config_value:
                 missing_configs.append(config_name)
@@ -110,13 +128,17 @@ class Config:
             for config in missing:
                 print(f"   - {config}")
         
-        print("\n📋 Loaded Configurations (using Managed Identity):")
+        auth_mode = "Managed Identity" if cls.USE_MANAGED_IDENTITY else "Keys"
+        print(f"\n📋 Loaded Configurations (using {auth_mode}):")
         print(f"   Azure Endpoint: {'✅' if cls.AZURE_ENDPOINT else '❌'}")
         print(f"   Azure Resource Group: {'✅' if cls.AZURE_RESOURCE_GROUP else '❌'}")
         print(f"   Cosmos DB Endpoint: {'✅' if cls.COSMOS_DB_ENDPOINT else '❌'}")
         print(f"   Blob Storage Account: {'✅' if cls.AZURE_STORAGE_ACCOUNT_NAME else '❌'}")
         print(f"   AI Search: {'✅' if cls.SEARCH_ENDPOINT else '⚠️ Optional'}")
-        print(f"   🔐 Authentication: Managed Identity (DefaultAzureCredential)")
+        if cls.USE_MANAGED_IDENTITY:
+            print(f"   🔐 Authentication: Managed Identity (DefaultAzureCredential)")
+        else:
+            print(f"   🔐 Authentication: Keys (Cosmos DB key, Storage key/connection string)")
         print("="*60 + "\n")
 
 
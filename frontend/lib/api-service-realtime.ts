@@ -26,7 +26,7 @@ export interface ClaimProcessingState {
 export type RealtimeClaimState = ClaimProcessingState;
 
 export interface SSEMessage {
-  type: 'agent_start' | 'agent_complete' | 'agent_error' | 'final_complete' | 'error';
+  type: 'agent_start' | 'agent_progress' | 'agent_complete' | 'agent_error' | 'final_complete' | 'error';
   agent_name: string;
   claim_id: string;
   timestamp: string;
@@ -35,6 +35,7 @@ export interface SSEMessage {
     total_steps?: number;
     status?: string;
     response?: string;
+    delta?: string;
     error?: string;
     processing_time_seconds?: number;
     description?: string;
@@ -128,6 +129,15 @@ export async function processClaimRealtime(
                 onUpdate({ ...state });
                 break;
 
+              case 'agent_progress':
+                // Partial response text; agent_complete replaces it with the full response
+                if (state.agents[message.agent_name]) {
+                  state.agents[message.agent_name].response =
+                    (state.agents[message.agent_name].response || '') + (message.data?.delta || '');
+                }
+                onUpdate({ ...state });
+                break;
+
               case 'agent_complete':
                 if (state.agents[message.agent_name]) {
                   state.agents[message.agent_name].status = 'completed';
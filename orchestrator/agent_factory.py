@@ -4,16 +4,41 @@ Handles creation and configuration of AI agents
 """
 
 import os
+import logging
+import hashlib
+import threading
 from pathlib import Path
-from typing import Optional
+from typing import Any, Callable, Dict, Optional, Tuple
 from azure.ai.projects import AIProjectClient
 from azure.ai.projects.models import AzureAISearchTool, ConnectionType
 from azure.identity import DefaultAzureCredential
 
+from .instruction_loader import load_instruction
+
+
+logger = logging.getLogger(__name__)
+
+# Search index field mappings for each agent's tool
+POLICY_FIELD_MAPPINGS = {
+    "content": "content",
+    "title": "document_title",
+    "source": "document_path",
+    "claim_type": "claim_category"
+}
+IMAGE_FIELD_MAPPINGS = {
+    "content": "content",
+    "title": "document_title",
+    "source": "document_path",
+    "image_ref": "bounding_box"
+}
+
 
 class AgentFactory:
     """Factory for creating and configuring AI agents"""
     
+    # Search connection id shared by every factory in the process
+    _search_connection_id_cache: Optional[str] = None
+    
     def __init__(self):
         """Initialize Azure AI Project client"""
         self.ENDPOINT = os.getenv("AZURE_ENDPOINT")
@@ -38,73 +63,82 @@ class AgentFactory:
         
         self.search_connection_id = self._find_or_create_search_connection()
         self.instructions_dir = Path(__file__).parent.parent / "instructions"
+        
+        # Build search tools once and reuse them for every agent
+        self._field_mappings_supported = True
+        self._policy_tool = self._create_search_tool("policyauto", POLICY_FIELD_MAPPINGS)
+        self._inspection_tool = self._create_search_tool("picturesauto", IMAGE_FIELD_MAPPINGS)
+        self._bill_tool = self._create_search_tool("billsauto", IMAGE_FIELD_MAPPINGS)
+        
+        # Agents with fixed instructions are created once and reused across claims
+        self._agent_pool: Dict[Tuple[str, str], str] = {}  # (kind, instructions sha256) -> agent id
+        self._agent_pool_lock = threading.Lock()  # Callers run in worker threads
+    
+    @classmethod
+    def refresh_connection(cls):
+        """Forget the cached search connection so the next factory looks it up again"""
+        cls._search_connection_id_cache = None
     
     def _find_or_create_search_connection(self) -> Optional[str]:
         """Find existing Azure AI Search connection or create one from environment variables"""
+        if AgentFactory._search_connection_id_cache:
+            return AgentFactory._search_connection_id_cache
+        
         try:
-            # First try to find an existing connection
-            conn_list = self.project_client.connections.list()
+            # First try to find an existing connection (filtered server-side)
+            conn_list = self.project_client.connections.list(
+                connection_type=ConnectionType.AZURE_AI_SEARCH
+            )
             for conn in conn_list:
                 if conn.connection_type == "CognitiveSearch":
-                    print(f"[OK] Found Azure AI Search connection: {conn.id}")
+                    logger.info("[OK] Found Azure AI Search connection: %s", conn.id)
+                    AgentFactory._search_connection_id_cache = conn.id
                     return conn.id
             
             # No connection found - try to use search endpoint directly if available
             if self.SEARCH_ENDPOINT and self.SEARCH_KEY:
-                print(f"[INFO] No Azure AI Search connection in project, using direct search configuration")
-                print(f"[OK] Using Azure AI Search endpoint: {self.SEARCH_ENDPOINT}")
+                logger.info("[INFO] No Azure AI Search connection in project, using direct search configuration")
+                logger.info("[OK] Using Azure AI Search endpoint: %s", self.SEARCH_ENDPOINT)
                 # Return a marker that we'll use direct configuration
                 return "DIRECT_SEARCH_CONFIG"
             
-            print("[WARNING] No Azure AI Search connection found and no SEARCH_ENDPOINT/SEARCH_KEY configured")
+            logger.warning("[WARNING] No Azure AI Search connection found and no SEARCH_ENDPOINT/SEARCH_KEY configured")
             return None
             
         except Exception as e:
-            print(f"[ERROR] Error finding search connection: {e}")
+            logger.error("[ERROR] Error finding search connection: %s", e)
             # Fall back to direct config if available
             if self.SEARCH_ENDPOINT and self.SEARCH_KEY:
-                print(f"[INFO] Falling back to direct search configuration")
+                logger.info("[INFO] Falling back to direct search configuration")
                 return "DIRECT_SEARCH_CONFIG"
             return None
     
     def _load_instruction(self, filename: str) -> str:
-        """Load instruction template from file"""
-        filepath = self.instructions_dir / filename
-        with open(filepath, "r") as f:
-            return f.read()
+        """Load instruction template from file (read once per process)"""
+        return load_instruction(filename)
     
     def _create_search_tool(self, index_name: str, field_mappings: dict = None):
         """Create an Azure AI Search tool for a specific index"""
-        try:
-            if field_mappings:
+        if field_mappings and self._field_mappings_supported:
+            try:
                 return AzureAISearchTool(
                     index_connection_id=self.search_connection_id,
                     index_name=index_name,
                     field_mappings=field_mappings
                 )
-            else:
-                return AzureAISearchTool(
-                    index_connection_id=self.search_connection_id,
-                    index_name=index_name
-                )
-        except TypeError:
-            print(f"[WARNING] Field mappings not supported for {index_name}. Using basic configuration.")
-            return AzureAISearchTool(
-                index_connection_id=self.search_connection_id,
-                index_name=index_name
-            )
+            except TypeError:
+                # Remember the SDK rejects field mappings so later tools skip the probe
+                self._field_mappings_supported = False
+                logger.warning("[WARNING] Field mappings not supported for %s. Using basic configuration.", index_name)
+        
+        return AzureAISearchTool(
+            index_connection_id=self.search_connection_id,
+            index_name=index_name
+        )
     
     def create_policy_agent(self, instructions_file: str = "policy_coverage_agent.txt"):
         """Create policy analysis agent"""
-        policy_search = self._create_search_tool(
-            "policyauto",
-            {
-                "content": "content",
-                "title": "document_title",
-                "source": "document_path",
-                "claim_type": "claim_category"
-            }
-        )
+        policy_search = self._policy_tool
         
         instructions = self._load_instruction(instructions_file)
         
@@ -118,15 +152,7 @@ class AgentFactory:
     
     def create_inspection_agent(self, instructions: str):
         """Create inspection analysis agent"""
-        inspection_search = self._create_search_tool(
-            "picturesauto",
-            {
-                "content": "content",
-                "title": "document_title",
-                "source": "document_path",
-                "image_ref": "bounding_box"
-            }
-        )
+        inspection_search = self._inspection_tool
         
         return self.project_client.agents.create_agent(
             model="gpt-4o",
@@ -138,15 +164,7 @@ class AgentFactory:
     
     def create_bill_agent(self, instructions: str):
         """Create bill reimbursement agent"""
-        bill_search = self._create_search_tool(
-            "billsauto",
-            {
-                "content": "content",
-                "title": "document_title",
-                "source": "document_path",
-                "image_ref": "bounding_box"
-            }
-        )
+        bill_search = self._bill_tool
         
         return self.project_client.agents.create_agent(
             model="gpt-4o",
@@ -156,9 +174,41 @@ class AgentFactory:
             tool_resources=bill_search.resources,
         )
     
+    @staticmethod
+    def _pool_key(kind: str, instructions: str) -> Tuple[str, str]:
+        return kind, hashlib.sha256(instructions.encode("utf-8")).hexdigest()
+    
+    def get_or_create_agent(self, kind: str, instructions: str, create_agent: Callable[[], Any]) -> str:
+        """Return the pooled agent id for these exact instructions, creating the agent on first use"""
+        key = self._pool_key(kind, instructions)
+        agent_id = self._agent_pool.get(key)
+        if agent_id is None:
+            with self._agent_pool_lock:
+                agent_id = self._agent_pool.get(key)  # Another claim may have just created it
+                if agent_id is None:
+                    agent_id = create_agent().id
+                    self._agent_pool[key] = agent_id
+                    logger.info("[OK] Pooled %s agent: %s", kind, agent_id)
+        return agent_id
+    
+    def discard_pooled_agent(self, kind: str, instructions: str):
+        """Drop and delete a pooled agent (e.g. after a failed run) so the next claim recreates it"""
+        with self._agent_pool_lock:
+            agent_id = self._agent_pool.pop(self._pool_key(kind, instructions), None)
+        if agent_id:
+            self.delete_agent(agent_id)
+    
+    def cleanup(self):
+        """Delete all pooled agents (call at shutdown)"""
+        with self._agent_pool_lock:
+            agent_ids = list(self._agent_pool.values())
+            self._agent_pool.clear()
+        for agent_id in agent_ids:
+            self.delete_agent(agent_id)
+    
     def delete_agent(self, agent_id: str):
         """Delete an agent to free resources"""
         try:
             self.project_client.agents.delete_agent(agent_id)
         except Exception as e:
-            print(f"[WARNING] Error deleting agent: {e}")
+            logger.warning("[WARNING] Error deleting agent: %s", e)
@@ -3,166 +3,211 @@ Data extraction utilities
 Parses text responses to extract structured data
 """
 
-from typing import Tuple
+import logging
+import re
+from functools import lru_cache
+from typing import Dict, Iterator, NamedTuple, Tuple
+
+
+logger = logging.getLogger(__name__)
+
+# Coverage keywords compiled into a single alternation so eligibility is
+# decided in one scan of the original text instead of lower() + 8 scans
+_COVERAGE_KEYWORDS = (
+    "collision coverage", "policy covers", "coverage applies",
+    "covered under", "own damage", "eligible", "reimbursement", "coverage"
+)
+_COVERAGE_RE = re.compile(
+    "|".join(re.escape(keyword) for keyword in _COVERAGE_KEYWORDS),
+    re.IGNORECASE
+)
+_TOTAL_LOSS_RE = re.compile(r"total loss", re.IGNORECASE)
+_NOT_QUALIFY_RE = re.compile(r"do not qualify", re.IGNORECASE)
+_AUTHENTIC_RE = re.compile(r"authentic|consistent", re.IGNORECASE)
+# Digit runs with thousands separators (e.g. 3,21,100 or 45,000)
+_NUM_RE = re.compile(r"\d[\d,]*")
+_RUPEE_AMT_RE = re.compile(r"₹\s*(\d[\d,]*)")
+# Whole lines containing a ₹ sign; lines without one are skipped inside the C scanner
+_RUPEE_LINE_RE = re.compile(r"^[^\n₹]*₹.*$", re.MULTILINE)
+
+# Keywords that mark a line as carrying each amount, with the accepted range
+_LINE_KEYWORD_RE = re.compile(
+    r"(?P<idv>idv|declared value)"
+    r"|(?P<deductible>deductible|compulsory)"
+    r"|(?P<cost>total|cost|repair|bill)"
+    r"|(?P<reimbursement>reimbursement|approved|payable)",
+    re.IGNORECASE
+)
+_AMOUNT_RANGES = {
+    "idv": (100000, 5000000),        # Reasonable IDV range
+    "deductible": (500, 50000),      # Typical deductible range
+    "cost": (10000, 5000000),
+    "reimbursement": (10000, 5000000),
+}
+
+# Largest accepted amount is ₹50,00,000 (7 digits); longer digit strings can
+# never pass a range check, so they are rejected before int() conversion
+_MAX_AMOUNT_DIGITS = 7
+
+
+def _to_amount(number: str) -> int:
+    """Convert a digit/comma run to an amount (0 when too long to be valid)"""
+    digits = number.replace(',', '')
+    if len(digits) > _MAX_AMOUNT_DIGITS:
+        return 0
+    return int(digits)
+
+
+def _line_amounts(line: str) -> Iterator[int]:
+    """
+    Yield each amount found on a line, in order.
+    Each digit run is a separate amount; the per-field extractors used to join
+    every digit on the line, so "Total: ₹12,500 (2 items)" read as 125002 and
+    failed the range check. It now yields 12500 then 2.
+    """
+    for match in _NUM_RE.finditer(line):
+        yield _to_amount(match.group())
+
+
+def _rupee_amounts(text: str) -> Iterator[int]:
+    """Yield each amount that directly follows a ₹ sign, in order"""
+    for match in _RUPEE_AMT_RE.finditer(text):
+        yield _to_amount(match.group(1))
 
 
 class DataExtractor:
     """Utility class for extracting structured data from text responses"""
     
     @staticmethod
-    def extract_idv_from_policy(policy_text: str) -> int:
-        """Extract IDV (Insured Declared Value) from policy agent's response"""
-        lines = policy_text.split('\n')
+    def extract_all(text: str) -> Dict[str, int]:
+        """
+        Extract IDV, deductible, cost and reimbursement amounts in one pass over the lines.
+        Values not found on a keyword line fall back to the ₹ amounts in the whole text; 0 if absent.
+        """
+        found: Dict[str, int] = {}
         
-        # Look for IDV in specific lines
-        for line in lines:
-            line_lower = line.lower()
-            if ('idv' in line_lower or 'declared value' in line_lower) and '₹' in line:
-                numbers = ''.join(c for c in line if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 100000 <= value <= 5000000:  # Reasonable IDV range
-                            return value
-                    except:
-                        continue
+        for line_match in _RUPEE_LINE_RE.finditer(text):
+            line = line_match.group()
+            tags = {match.lastgroup for match in _LINE_KEYWORD_RE.finditer(line)}
+            tags.difference_update(found)
+            if not tags:
+                continue
+            amounts = list(_line_amounts(line))
+            for tag in tags:
+                low, high = _AMOUNT_RANGES[tag]
+                for value in amounts:
+                    if low <= value <= high:
+                        found[tag] = value
+                        break
+            if len(found) == len(_AMOUNT_RANGES):
+                break
         
-        # Fallback: look for any reasonable amount
-        if '₹' in policy_text:
-            parts = policy_text.split('₹')
-            for i in range(1, len(parts)):
-                amount_text = parts[i][:20]
-                numbers = ''.join(c for c in amount_text if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 100000 <= value <= 5000000:
-                            return value
-                    except:
-                        continue
+        if len(found) < len(_AMOUNT_RANGES):
+            # Fallback: first reasonable amount anywhere in the text (stops at the first match)
+            for tag in ("idv", "reimbursement"):
+                if tag not in found:
+                    low, high = _AMOUNT_RANGES[tag]
+                    found[tag] = next((v for v in _rupee_amounts(text) if low <= v <= high), 0)
+            
+            # Fallback: largest reasonable amount
+            if "cost" not in found:
+                low, high = _AMOUNT_RANGES["cost"]
+                found["cost"] = max((v for v in _rupee_amounts(text) if low <= v <= high), default=0)
+            
+            # Fallback: common deductible amounts
+            if "deductible" not in found:
+                if "1000" in text or "1,000" in text:
+                    found["deductible"] = 1000
+                elif "2000" in text or "2,000" in text:
+                    found["deductible"] = 2000
+                elif "5000" in text or "5,000" in text:
+                    found["deductible"] = 5000
+                else:
+                    found["deductible"] = 0
         
-        print("[WARNING] Warning: IDV not found in policy agent response")
-        return 0
+        return found
+    
+    @staticmethod
+    def extract_idv_from_policy(policy_text: str) -> int:
+        """Extract IDV (Insured Declared Value) from policy agent's response"""
+        idv = _parse(policy_text).idv
+        if not idv:
+            logger.warning("[WARNING] Warning: IDV not found in policy agent response")
+        return idv
     
     @staticmethod
     def extract_deductible(policy_text: str) -> int:
         """Extract deductible amount from policy agent's response"""
-        lines = policy_text.split('\n')
-        
-        for line in lines:
-            line_lower = line.lower()
-            if ('deductible' in line_lower or 'compulsory' in line_lower) and '₹' in line:
-                numbers = ''.join(c for c in line if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 500 <= value <= 50000:  # Typical deductible range
-                            return value
-                    except:
-                        continue
-        
-        # Look for common deductible amounts
-        if "1000" in policy_text or "1,000" in policy_text:
-            return 1000
-        elif "2000" in policy_text or "2,000" in policy_text:
-            return 2000
-        elif "5000" in policy_text or "5,000" in policy_text:
-            return 5000
-        
-        print("[WARNING] Warning: Deductible not found in policy agent response")
-        return 0
+        deductible = _parse(policy_text).deductible
+        if not deductible:
+            logger.warning("[WARNING] Warning: Deductible not found in policy agent response")
+        return deductible
     
     @staticmethod
     def extract_cost_estimate(text: str) -> int:
         """Extract cost estimate from text analysis"""
-        lines = text.split('\n')
-        
-        # Look for cost-related lines
-        for line in lines:
-            line_lower = line.lower()
-            if ('total' in line_lower or 'cost' in line_lower or 
-                'repair' in line_lower or 'bill' in line_lower) and '₹' in line:
-                numbers = ''.join(c for c in line if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 10000 <= value <= 5000000:
-                            return value
-                    except:
-                        continue
-        
-        # Fallback: find largest reasonable amount
-        if '₹' in text:
-            parts = text.split('₹')
-            max_amount = 0
-            for i in range(1, len(parts)):
-                amount_text = parts[i][:20]
-                numbers = ''.join(c for c in amount_text if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 10000 <= value <= 5000000 and value > max_amount:
-                            max_amount = value
-                    except:
-                        continue
-            if max_amount > 0:
-                return max_amount
-        
-        print("[WARNING] Warning: Repair cost not found in agent responses")
-        return 0
+        cost = _parse(text).cost
+        if not cost:
+            logger.warning("[WARNING] Warning: Repair cost not found in agent responses")
+        return cost
     
     @staticmethod
     def extract_reimbursement_amount(text: str) -> int:
         """Extract specific reimbursement amount from bill analysis text"""
-        lines = text.split('\n')
-        
-        for line in lines:
-            line_lower = line.lower()
-            if ('reimbursement' in line_lower or 'approved' in line_lower or 
-                'payable' in line_lower) and '₹' in line:
-                numbers = ''.join(c for c in line if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 10000 <= value <= 5000000:
-                            return value
-                    except:
-                        continue
-        
-        # Fallback
-        if '₹' in text:
-            parts = text.split('₹')
-            for i in range(1, len(parts)):
-                amount_text = parts[i][:20]
-                numbers = ''.join(c for c in amount_text if c.isdigit() or c == ',')
-                if numbers:
-                    try:
-                        value = int(numbers.replace(',', ''))
-                        if 10000 <= value <= 5000000:
-                            return value
-                    except:
-                        continue
-        
-        return 0
+        return _parse(text).reimbursement
     
     @staticmethod
     def check_coverage_eligibility(policy_text: str) -> bool:
         """Check if the claim is eligible for coverage"""
-        policy_lower = policy_text.lower()
-        coverage_keywords = [
-            "collision coverage", "policy covers", "coverage applies",
-            "covered under", "own damage", "eligible", "reimbursement", "coverage"
-        ]
-        return any(keyword in policy_lower for keyword in coverage_keywords)
+        return _parse(policy_text).coverage_eligible
     
     @staticmethod
     def check_total_loss(text: str) -> bool:
         """Check if total loss is indicated"""
-        text_lower = text.lower()
-        return "total loss" in text_lower and "do not qualify" not in text_lower
+        return _parse(text).total_loss
     
     @staticmethod
     def check_damage_authentic(text: str) -> bool:
         """Check if damage is authentic"""
-        text_lower = text.lower()
-        return "authentic" in text_lower or "consistent" in text_lower
+        return _parse(text).damage_authentic
+    
+    @staticmethod
+    def clear_cache() -> None:
+        """Drop memoized extraction results"""
+        _parse.cache_clear()
+    
+    @staticmethod
+    def cache_stats() -> str:
+        """Hit/miss summary of the memoized extraction results"""
+        info = _parse.cache_info()
+        lookups = info.hits + info.misses
+        hit_rate = info.hits / lookups if lookups else 0.0
+        return f"{info.hits}/{lookups} hits ({hit_rate:.0%}), {info.currsize}/{info.maxsize} entries"
+
+
+class _ParsedText(NamedTuple):
+    """Every value extracted from one response text"""
+    idv: int
+    deductible: int
+    cost: int
+    reimbursement: int
+    coverage_eligible: bool
+    total_loss: bool
+    damage_authentic: bool
+
+
+# Sized for a portfolio: the same policy analysis recurs across re-opened claims and endorsements
+@lru_cache(maxsize=1024)
+def _parse(text: str) -> _ParsedText:
+    """Extract all values from a response once; repeat calls on the same text hit the cache"""
+    amounts = DataExtractor.extract_all(text)
+    return _ParsedText(
+        idv=amounts["idv"],
+        deductible=amounts["deductible"],
+        cost=amounts["cost"],
+        reimbursement=amounts["reimbursement"],
+        coverage_eligible=_COVERAGE_RE.search(text) is not None,
+        total_loss=(_TOTAL_LOSS_RE.search(text) is not None and
+                    _NOT_QUALIFY_RE.search(text) is None),
+        damage_authentic=_AUTHENTIC_RE.search(text) is not None
+    )
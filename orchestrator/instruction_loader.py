@@ -0,0 +1,16 @@
+"""
+Instruction Loader
+Reads instruction templates once per process and shares them across components
+"""
+
+from functools import lru_cache
+from pathlib import Path
+
+INSTRUCTIONS_DIR = Path(__file__).parent.parent / "instructions"
+
+
+@lru_cache(maxsize=32)
+def load_instruction(filename: str) -> str:
+    """Read an instruction file once; templates don't change while the process runs"""
+    with open(INSTRUCTIONS_DIR / filename, "r", encoding="utf-8") as f:
+        return f.read()
@@ -0,0 +1,77 @@
+"""
+LLM Response Cache
+Content-addressed cache of agent replies so re-running a claim skips the LLM round-trip
+Opt-in: set CLAIM_LLM_CACHE_DIR to a directory to enable it
+"""
+
+import hashlib
+import json
+import logging
+import os
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Any, Dict, Optional
+
+
+logger = logging.getLogger(__name__)
+
+
+class LLMCache:
+    """Disk cache of agent results keyed by a hash of everything that shapes the reply"""
+
+    def __init__(self, cache_dir: Optional[str] = None):
+        """Enable the cache when a directory is given or CLAIM_LLM_CACHE_DIR is set"""
+        cache_dir = cache_dir or os.getenv("CLAIM_LLM_CACHE_DIR")
+        self.cache_dir = Path(cache_dir) if cache_dir else None
+        if self.cache_dir:
+            self.cache_dir.mkdir(parents=True, exist_ok=True)
+            logger.info("[INFO] LLM response cache enabled at %s", self.cache_dir)
+
+    @property
+    def enabled(self) -> bool:
+        return self.cache_dir is not None
+
+    @staticmethod
+    def normalize_query(query: str) -> str:
+        """Case- and whitespace-insensitive form of a query; numbers and wording are kept as-is"""
+        return " ".join(query.lower().split())
+
+    @staticmethod
+    def make_key(step: str, model: str, instructions: str, query: str, upstream: Any = None) -> str:
+        """SHA-256 over length-prefixed components, so no two component lists can collide"""
+        digest = hashlib.sha256()
+        components = (
+            step, model, instructions, LLMCache.normalize_query(query),
+            json.dumps(upstream, sort_keys=True, default=str)
+        )
+        for component in components:
+            data = component.encode("utf-8")
+            digest.update(len(data).to_bytes(8, "big"))
+            digest.update(data)
+        return digest.hexdigest()
+
+    def _path(self, key: str) -> Path:
+        return self.cache_dir / f"{key}.json"
+
+    def get(self, key: str) -> Optional[Dict[str, Any]]:
+        """Return the cached entry for a key, or None on a miss (or when disabled)"""
+        if not self.enabled:
+            return None
+        try:
+            with open(self._path(key), "r", encoding="utf-8") as f:
+                return json.load(f)
+        except (OSError, ValueError):
+            return None
+
+    def put(self, key: str, result: str) -> None:
+        """Store a successful agent result (written atomically)"""
+        if not self.enabled:
+            return
+        entry = {"result": result, "ts": datetime.now(timezone.utc).isoformat()}
+        tmp_path = self._path(key).with_suffix(".tmp")
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as f:
+                json.dump(entry, f, ensure_ascii=False)
+            os.replace(tmp_path, self._path(key))
+        except OSError as e:
+            logger.warning("[WARNING] Could not write LLM cache entry: %s", e)
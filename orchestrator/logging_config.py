@@ -0,0 +1,30 @@
+"""
+Logging Configuration
+Queue-based logging so emitting a record never blocks on console I/O
+"""
+
+import logging
+import os
+import queue
+from logging.handlers import QueueHandler, QueueListener
+from typing import Optional
+
+
+def configure_logging(level: Optional[str] = None) -> QueueListener:
+    """
+    Attach a QueueHandler to the root logger and start a listener thread
+    that writes to stderr. Level defaults to LOG_LEVEL (INFO if unset).
+    Call stop() on the returned listener at exit.
+    """
+    log_queue: queue.SimpleQueue = queue.SimpleQueue()
+
+    console_handler = logging.StreamHandler()
+    console_handler.setFormatter(logging.Formatter("%(message)s"))
+
+    root_logger = logging.getLogger()
+    root_logger.addHandler(QueueHandler(log_queue))
+    root_logger.setLevel((level or os.getenv("LOG_LEVEL", "INFO")).upper())
+
+    listener = QueueListener(log_queue, console_handler, respect_handler_level=True)
+    listener.start()
+    return listener
@@ -6,72 +6,211 @@ Falls back to in-memory storage when Cosmos DB is unavailable (e.g., network dis
 """
 
 import os
-from typing import Dict, Any, Optional, List
-from azure.cosmos import CosmosClient, PartitionKey
-from azure.identity import ManagedIdentityCredential, AzureCliCredential
-from datetime import datetime
+import asyncio
+import logging
+import time
+import weakref
+from collections import OrderedDict
+from functools import lru_cache
+from typing import Dict, Any, NamedTuple, Optional, List, Tuple
+
+from .runtime import running_with_managed_identity, runtime_env_set
+
+# azure.cosmos / azure.identity are imported where first needed, so runs without
+# COSMOS_DB_ENDPOINT (in-memory only) never load the SDKs
+
+logger = logging.getLogger(__name__)
+
+# Upper bound on background Cosmos writes in flight at once (back-pressure)
+MAX_PENDING_WRITES = 8
+# High-water mark for buffered (not yet written) operations across all claims;
+# stores above it wait for a background write to finish before buffering more
+MAX_BUFFERED_OPERATIONS = 512
+
+# Cosmos DB transactional batches accept at most 100 operations
+MAX_BATCH_OPERATIONS = 100
+
+# retrieve_previous_responses results are reused for this long (writes invalidate them)
+RETRIEVE_CACHE_TTL_NS = 5 * 1_000_000_000
+RETRIEVE_CACHE_MAX_ENTRIES = 256
+
+# Client options: Session consistency gives read-your-writes at a fraction of Strong's cost,
+# and throttled/transient requests retry quickly instead of failing the agent step.
+# (The Python SDK only supports Gateway mode, so there is no Direct/TCP setting.)
+COSMOS_CLIENT_OPTIONS = {
+    "consistency_level": "Session",
+    "connection_verify": True,
+    "retry_total": 5,
+    "retry_backoff_max": 1,
+}
+
+
+class _CosmosConnection(NamedTuple):
+    """A verified async client and the container proxy/credential that belong to it"""
+    client: Any
+    container: Any
+    credential: Optional[Any]
+    auth_method: str
+
+
+class _LoopConnections(NamedTuple):
+    """Verified clients of one event loop, keyed by (endpoint, database, container)"""
+    lock: asyncio.Lock
+    connections: Dict[Tuple[str, str, str], _CosmosConnection]
+
+
+# Verified clients shared by every CosmosMemoryManager, so pooled connections and tokens
+# are reused. Kept per event loop: the aiohttp session behind a client (and the lock)
+# belong to the loop that created them, so a later asyncio.run() in the same process
+# gets its own. They are closed only by CosmosMemoryManager.close() at shutdown.
+_loop_connections: "weakref.WeakKeyDictionary[asyncio.AbstractEventLoop, _LoopConnections]" = weakref.WeakKeyDictionary()
+
+
+def _shared_connections() -> _LoopConnections:
+    """Return the running event loop's shared clients, creating the entry (and lock) on first use"""
+    loop = asyncio.get_running_loop()
+    shared = _loop_connections.get(loop)
+    if shared is None:
+        shared = _loop_connections[loop] = _LoopConnections(asyncio.Lock(), {})
+    return shared
+
+
+def _document_stamp(claim_id: str, agent_type: str) -> Tuple[str, str]:
+    """
+    Return (document id, ISO timestamp) from a single clock read so the two always agree.
+    The nanosecond suffix keeps ids unique for writes within the same second.
+    """
+    now_ns = time.time_ns()
+    seconds, nanos = divmod(now_ns, 1_000_000_000)
+    local = time.localtime(seconds)  # Same local wall-clock time datetime.now() gave
+    return (
+        f"{claim_id}_{agent_type}_{time.strftime('%Y%m%d_%H%M%S', local)}_{nanos:09d}",
+        f"{time.strftime('%Y-%m-%dT%H:%M:%S', local)}.{nanos // 1000:06d}"
+    )
+
+
+# Query text is fixed per shape; only the parameter values change between calls
+_LATEST_SQL = (
+    "SELECT TOP 1 c.response_data, c.extracted_data, c.timestamp FROM c "
+    "WHERE c.claim_id = @claim_id AND c.agent_type = @agent_type "
+    "ORDER BY c.timestamp DESC"
+)
+_ALL_SQL = (
+    "SELECT c.agent_type, c.response_data, c.extracted_data, c.timestamp, c.status "
+    "FROM c WHERE c.claim_id = @claim_id AND IS_DEFINED(c.agent_type) "
+    "ORDER BY c.timestamp ASC"
+)
+
+
+@lru_cache(maxsize=32)
+def _retrieve_sql(agent_type_count: int) -> str:
+    """Query for retrieve_previous_responses with @agent_0..@agent_{n-1} placeholders (0 = all agents)"""
+    query = (
+        "SELECT c.agent_type, c.response_data, c.extracted_data, c.timestamp "
+        "FROM c WHERE c.claim_id = @claim_id"
+    )
+    if agent_type_count:
+        placeholders = ', '.join(f"@agent_{i}" for i in range(agent_type_count))
+        query += f" AND c.agent_type IN ({placeholders})"
+    else:
+        query += " AND IS_DEFINED(c.agent_type)"  # Skip latest pointers
+    return query  # Unordered: the newest row per agent is picked client-side
+
+
+def _latest_pointer_id(claim_id: str, agent_type: str) -> str:
+    """Id of the document that mirrors the latest response of an agent for a claim"""
+    return f"latest_{claim_id}_{agent_type}"
 
 
 class InMemoryStorage:
     """
     Simple in-memory storage fallback when Cosmos DB is unavailable.
-    Data persists only during the application session.
+    Data persists only during the application session, and only for the
+    MEMORY_MAX_CLAIMS most recently used claims (least recently used are evicted).
+    Documents hold the caller's data by reference (no copies): treat stored and
+    returned values as read-only.
     """
     
     def __init__(self):
-        self._storage: Dict[str, List[Dict[str, Any]]] = {}
-        print("[INFO] In-memory storage initialized (Cosmos DB unavailable)")
+        self._storage: "OrderedDict[str, List[Dict[str, Any]]]" = OrderedDict()
+        self._max_claims = int(os.getenv("MEMORY_MAX_CLAIMS", "1024"))
+        self._latest: Dict[Tuple[str, str], Dict[str, Any]] = {}  # Newest document per (claim, agent)
+        logger.info("[INFO] In-memory storage initialized (Cosmos DB unavailable)")
+    
+    def _touch(self, claim_id: str) -> Optional[List[Dict[str, Any]]]:
+        """Return a claim's documents and mark it most recently used"""
+        documents = self._storage.get(claim_id)
+        if documents is not None:
+            self._storage.move_to_end(claim_id)
+        return documents
     
-    def store(self, claim_id: str, agent_type: str, response_data: str, extracted_data: Dict[str, Any] = None) -> bool:
-        if claim_id not in self._storage:
+    def store(self, claim_id: str, agent_type: str, response_data: str, extracted_data: Dict[str, Any] = None) -> Dict[str, Any]:
+        """Store a response and return the document (its id/timestamp are reused for Cosmos DB)"""
+        if self._touch(claim_id) is None:
             self._storage[claim_id] = []
+            while len(self._storage) > self._max_claims:
+                evicted_id, evicted = self._storage.popitem(last=False)
+                for item in evicted:
+                    self._latest.pop((evicted_id, item["agent_type"]), None)
         
+        document_id, timestamp = _document_stamp(claim_id, agent_type)
         document = {
-            "id": f"{claim_id}_{agent_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+            "id": document_id,
             "claim_id": claim_id,
             "agent_type": agent_type,
             "response_data": response_data,
-            "extracted_data": extracted_data or {},
-            "timestamp": datetime.now().isoformat(),
+            "extracted_data": extracted_data if extracted_data is not None else {},
+            "timestamp": timestamp,
             "status": "completed"
         }
         self._storage[claim_id].append(document)
-        print(f"[MEMORY] Stored {agent_type} response for claim {claim_id} (in-memory)")
-        return True
+        self._latest[(claim_id, agent_type)] = document
+        logger.debug("[MEMORY] Stored %s response for claim %s (in-memory)", agent_type, claim_id)
+        return document
     
     def retrieve(self, claim_id: str, agent_types: List[str] = None) -> Dict[str, Any]:
-        if claim_id not in self._storage:
+        documents = self._touch(claim_id)
+        if documents is None:
             return {}
         
-        responses = {}
-        for item in self._storage[claim_id]:
-            agent_type = item["agent_type"]
-            if agent_types is None or agent_type in agent_types:
-                responses[agent_type] = {
-                    "response_data": item["response_data"],
-                    "extracted_data": item.get("extracted_data", {}),
-                    "timestamp": item["timestamp"]
-                }
-        return responses
+        if agent_types is not None:
+            # Latest per requested agent straight from the index
+            latest_items = (self._latest.get((claim_id, agent_type)) for agent_type in agent_types)
+        else:
+            # Documents are append-ordered, so the first hit walking backwards is the latest
+            seen = set()
+            latest_items = []
+            for item in reversed(documents):
+                if item["agent_type"] not in seen:
+                    seen.add(item["agent_type"])
+                    latest_items.append(item)
+            latest_items.reverse()  # Back to chronological order
+        
+        return {
+            item["agent_type"]: {
+                "response_data": item["response_data"],
+                "extracted_data": item.get("extracted_data", {}),
+                "timestamp": item["timestamp"]
+            }
+            for item in latest_items if item is not None
+        }
     
     def get_latest(self, claim_id: str, agent_type: str) -> Dict[str, Any]:
-        if claim_id not in self._storage:
+        latest = self._latest.get((claim_id, agent_type))
+        if latest is None:
             return {}
-        
-        matching = [item for item in self._storage[claim_id] if item["agent_type"] == agent_type]
-        if matching:
-            latest = max(matching, key=lambda x: x["timestamp"])
-            return {
-                "response_data": latest["response_data"],
-                "extracted_data": latest.get("extracted_data", {}),
-                "timestamp": latest["timestamp"]
-            }
-        return {}
+        self._touch(claim_id)
+        return {
+            "response_data": latest["response_data"],
+            "extracted_data": latest.get("extracted_data", {}),
+            "timestamp": latest["timestamp"]
+        }
     
     def get_all(self, claim_id: str) -> List[Dict[str, Any]]:
-        if claim_id not in self._storage:
+        documents = self._touch(claim_id)
+        if documents is None:
             return []
-        return self._storage[claim_id]
+        return documents
 
 
 class CosmosMemoryManager:
@@ -83,75 +222,154 @@ class CosmosMemoryManager:
     """
     
     def __init__(self, cosmos_endpoint: str = None):
-        """Initialize Cosmos DB client with Managed Identity or Azure CLI credential"""
+        """Configure the async Cosmos DB client; the connection is verified by connect()"""
         self._in_memory = InMemoryStorage()  # Always create fallback
         self._use_cosmos = False  # Track if Cosmos is available
+        self._connected = False  # Set once connect() has verified (or given up on) Cosmos DB
+        self._write_buffer: Dict[str, List[Tuple[str, Dict[str, Any]]]] = {}  # Unwritten (operation, document) per claim
+        self._flush_tasks: Dict[str, asyncio.Task] = {}  # Background writer per claim
+        self._write_slots = asyncio.Semaphore(MAX_PENDING_WRITES)
+        # (claim_id, agent_types) -> (responses, expiry in monotonic ns), least recently used first
+        self._retrieve_cache: "OrderedDict[Tuple[str, Optional[Tuple[str, ...]]], Tuple[Dict[str, Any], int]]" = OrderedDict()
+        self.client = None
+        self.container = None
+        self._credential = None
+        self.auth_method = None
+        self._loop = None  # Event loop the client belongs to
         
-        try:
-            # Get Cosmos DB configuration from environment variables
-            self.cosmos_endpoint = cosmos_endpoint or os.getenv("COSMOS_DB_ENDPOINT")
-            self.cosmos_key = os.getenv("COSMOS_DB_KEY")
-            
-            if not self.cosmos_endpoint:
-                print("⚠️ COSMOS_DB_ENDPOINT not found in environment variables")
-                self.client = None
-                self.container = None
-                return
+        # Get Cosmos DB configuration from environment variables
+        self.cosmos_endpoint = cosmos_endpoint or os.getenv("COSMOS_DB_ENDPOINT")
+        self.cosmos_key = os.getenv("COSMOS_DB_KEY")
+        # USE_MANAGED_IDENTITY=false skips Entra ID and uses the account key only
+        self.use_managed_identity = os.getenv("USE_MANAGED_IDENTITY", "true").lower() != "false"
+        
+        # Database and container configuration
+        self.database_name = os.getenv("COSMOS_DB_DATABASE_NAME", "insurance")
+        self.container_name = os.getenv("COSMOS_DB_CONTAINER_NAME", "data")
+        
+        if not self.cosmos_endpoint:
+            logger.warning("⚠️ COSMOS_DB_ENDPOINT not found in environment variables")
+            self._connected = True
+            return
+        
+        self._use_cosmos = True
+    
+    def _open_client(self, credential) -> None:
+        """Create the async client and container proxy for a credential (no network I/O)"""
+        from azure.cosmos.aio import CosmosClient
+        self.client = CosmosClient(self.cosmos_endpoint, credential=credential, **COSMOS_CLIENT_OPTIONS)
+        self.container = self.client.get_database_client(
+            self.database_name
+        ).get_container_client(self.container_name)
+    
+    async def _close_client(self) -> None:
+        """Close the async client and any credential it owns"""
+        if self.client is not None:
+            await self.client.close()
+            self.client = None
+            self.container = None
+        if self._credential is not None:
+            await self._credential.close()
+            self._credential = None
+    
+    async def _connect_with_entra_id(self) -> None:
+        """Open and verify the client with Managed Identity (in Azure) or Azure CLI (locally)"""
+        from azure.identity.aio import ManagedIdentityCredential, AzureCliCredential
+        logger.info("🔐 Trying Azure authentication...")
+        if running_with_managed_identity():
+            # RUNTIME_ENV names the host - same choice (and identity) as the Azure OpenAI client
+            logger.info("   (Running in Azure - using Managed Identity)")
+            self._credential = ManagedIdentityCredential(client_id=os.getenv("AZURE_CLIENT_ID"))
+        elif not runtime_env_set() and os.getenv("WEBSITE_INSTANCE_ID"):
+            # RUNTIME_ENV unset on App Service (has WEBSITE_INSTANCE_ID env var) - system-assigned identity
+            logger.info("   (Running in Azure - using Managed Identity)")
+            self._credential = ManagedIdentityCredential()
+        else:
+            # Local - use AzureCLI (faster)
+            logger.info("   (Running locally - using Azure CLI)")
+            self._credential = AzureCliCredential()
+        
+        self._open_client(self._credential)
+        # Verify access by reading container properties
+        await self.container.read()
+        self.auth_method = "Entra ID (Managed Identity / CLI)"
+        logger.info("[OK] Cosmos DB connected with %s", self.auth_method)
+    
+    async def _connect_with_key(self) -> None:
+        """Open and verify the client with the account key"""
+        logger.info("🔑 Trying Key-based authentication...")
+        self._open_client(self.cosmos_key)
+        await self.container.read()
+        self.auth_method = "Key-based"
+        logger.info("[OK] Cosmos DB connected with Key-based auth")
+    
+    async def connect(self) -> bool:
+        """
+        Verify Cosmos DB access once, trying Entra ID first and then the account key
+        (only the key when USE_MANAGED_IDENTITY=false).
+        Reuses the process-wide client when another manager already connected.
+        Called at startup and lazily by every operation; returns whether Cosmos DB is in use.
+        """
+        loop = asyncio.get_running_loop()
+        if self.client is not None and self._loop is not loop:
+            # Connected under an earlier event loop (a previous asyncio.run): start over on this one
+            self.client = None
+            self.container = None
+            self._credential = None
+            self._flush_tasks.clear()
+            self._write_slots = asyncio.Semaphore(MAX_PENDING_WRITES)
+            self._connected = False
+        
+        if self._connected:
+            return self._use_cosmos
+        
+        loop_connections = _shared_connections()
+        async with loop_connections.lock:
+            if self._connected:
+                return self._use_cosmos
             
-            # Database and container configuration
-            self.database_name = os.getenv("COSMOS_DB_DATABASE_NAME", "insurance")
-            self.container_name = os.getenv("COSMOS_DB_CONTAINER_NAME", "data")
+            self._loop = loop
+            connection_key = (self.cosmos_endpoint, self.database_name, self.container_name)
+            shared = loop_connections.connections.get(connection_key)
+            if shared is not None:
+                self.client, self.container, self._credential, self.auth_method = shared
+                self._connected = True
+                return self._use_cosmos
             
-            # Choose credential based on environment
-            auth_method = None
             try:
-                print("🔐 Trying Azure authentication...")
-                # Check if running in Azure (has WEBSITE_INSTANCE_ID env var)
-                if os.getenv("WEBSITE_INSTANCE_ID"):
-                    # In Azure - use ManagedIdentity
-                    print("   (Running in Azure - using Managed Identity)")
-                    credential = ManagedIdentityCredential()
+                if not self.use_managed_identity:
+                    if not self.cosmos_key:
+                        raise ValueError("USE_MANAGED_IDENTITY=false but COSMOS_DB_KEY is not set")
+                    await self._connect_with_key()
                 else:
-                    # Local - use AzureCLI (faster)
-                    print("   (Running locally - using Azure CLI)")
-                    credential = AzureCliCredential()
-                
-                self.client = CosmosClient(self.cosmos_endpoint, credential=credential)
-                # Test the connection by getting database
-                self.database = self.client.get_database_client(self.database_name)
-                self.container = self.database.get_container_client(self.container_name)
-                # Verify access by reading container properties
-                self.container.read()
-                auth_method = "Entra ID (Managed Identity / CLI)"
-                print(f"[OK] Cosmos DB connected with {auth_method}")
-            except Exception as mi_error:
-                print(f"⚠️ Entra ID auth failed: {mi_error}")
-                # Fall back to Key-based auth if available
-                if self.cosmos_key:
                     try:
-                        print("🔑 Trying Key-based authentication...")
-                        self.client = CosmosClient(self.cosmos_endpoint, credential=self.cosmos_key)
-                        self.database = self.client.get_database_client(self.database_name)
-                        self.container = self.database.get_container_client(self.container_name)
-                        self.container.read()
-                        auth_method = "Key-based"
-                        print(f"[OK] Cosmos DB connected with Key-based auth")
-                    except Exception as key_error:
-                        print(f"❌ Key-based auth also failed: {key_error}")
-                        raise key_error
-                else:
-                    raise mi_error
-            
-            print(f"[OK] Cosmos DB Memory Manager initialized with {auth_method}")
-            print(f"     Database: {self.database_name}, Container: {self.container_name}")
-            self._use_cosmos = True
+                        await self._connect_with_entra_id()
+                    except Exception as mi_error:
+                        logger.warning("⚠️ Entra ID auth failed: %s", mi_error)
+                        await self._close_client()
+                        # Fall back to Key-based auth if available
+                        if not self.cosmos_key:
+                            raise mi_error
+                        try:
+                            await self._connect_with_key()
+                        except Exception as key_error:
+                            logger.error("❌ Key-based auth also failed: %s", key_error)
+                            raise key_error
+                
+                logger.info("[OK] Cosmos DB Memory Manager initialized with %s", self.auth_method)
+                logger.info("     Database: %s, Container: %s", self.database_name, self.container_name)
+                loop_connections.connections[connection_key] = _CosmosConnection(
+                    self.client, self.container, self._credential, self.auth_method
+                )
+                
+            except Exception as e:
+                logger.warning("[WARNING] Cosmos DB unavailable: %s", e)
+                logger.info("[INFO] Using in-memory storage as fallback (data will not persist)")
+                await self._close_client()
+                self._use_cosmos = False
             
-        except Exception as e:
-            print(f"[WARNING] Cosmos DB unavailable: {e}")
-            print(f"[INFO] Using in-memory storage as fallback (data will not persist)")
-            self.client = None
-            self.container = None
-            self._use_cosmos = False
+            self._connected = True
+            return self._use_cosmos
     
     async def store_agent_response(
         self, 
@@ -160,129 +378,263 @@ class CosmosMemoryManager:
         response_data: str, 
         extracted_data: Dict[str, Any] = None
     ) -> bool:
-        """Store agent response in Cosmos DB or in-memory fallback"""
-        # Always store in memory as backup
-        self._in_memory.store(claim_id, agent_type, response_data, extracted_data)
+        """
+        Store agent response in memory and queue the Cosmos DB write in the background.
+        Reads for the same claim wait for its pending writes; call flush() before exit.
+        """
+        return await self.store_agent_responses_batch(
+            claim_id, [(agent_type, response_data, extracted_data)]
+        )
+    
+    async def store_agent_responses_batch(
+        self,
+        claim_id: str,
+        responses: List[Tuple[str, str, Optional[Dict[str, Any]]]]
+    ) -> bool:
+        """
+        Store several (agent_type, response_data, extracted_data) responses for one claim.
+        Pending documents for a claim are written together as one transactional batch,
+        along with a "latest" pointer document per agent for point reads.
+        """
+        # Always store in memory as backup; Cosmos reuses the same id and timestamp
+        stored = [
+            self._in_memory.store(claim_id, agent_type, response_data, extracted_data)
+            for agent_type, response_data, extracted_data in responses
+        ]
         
-        if not self._use_cosmos or not self.container:
+        if not await self.connect():
             return True  # In-memory storage succeeded
         
-        try:
-            document = {
-                "id": f"{claim_id}_{agent_type}_{datetime.now().strftime('%Y%m%d_%H%M%S')}",
+        self._invalidate_retrieve_cache(claim_id)
+        await self._wait_for_buffer_space()
+        buffer = self._write_buffer.setdefault(claim_id, [])
+        for stored_document in stored:
+            document = dict(stored_document)  # Own copy: the SDK may annotate the body
+            agent_type = document["agent_type"]
+            # Pointers carry "latest_of" rather than "agent_type" so history queries skip them
+            pointer = {
+                "id": _latest_pointer_id(claim_id, agent_type),
                 "claim_id": claim_id,
-                "agent_type": agent_type,
-                "response_data": response_data,
-                "extracted_data": extracted_data or {},
-                "timestamp": datetime.now().isoformat(),
-                "status": "completed"
+                "latest_of": agent_type,
+                "response_id": document["id"],
+                "response_data": document["response_data"],
+                "extracted_data": document["extracted_data"],
+                "timestamp": document["timestamp"]
             }
-            
-            self.container.create_item(body=document)
-            print(f"[SAVED] Stored {agent_type} response for claim {claim_id} in Cosmos DB")
-            return True
-            
-        except Exception as e:
-            print(f"[WARNING] Cosmos DB store failed, using in-memory: {e}")
-            return True  # In-memory already stored above
+            # Only the newest pending pointer per agent needs writing
+            buffer[:] = [op for op in buffer if op[1]["id"] != pointer["id"]]
+            buffer.append(("create", document))
+            buffer.append(("upsert", pointer))
+        
+        if claim_id not in self._flush_tasks:
+            self._flush_tasks[claim_id] = asyncio.create_task(self._drain_writes(claim_id))
+        return True
+    
+    async def _wait_for_buffer_space(self) -> None:
+        """Block while the write buffer is at its high-water mark, so a burst of stores cannot grow it without limit"""
+        while (self._flush_tasks
+               and sum(len(operations) for operations in self._write_buffer.values()) >= MAX_BUFFERED_OPERATIONS):
+            await asyncio.wait(list(self._flush_tasks.values()), return_when=asyncio.FIRST_COMPLETED)
+    
+    async def _drain_writes(self, claim_id: str) -> None:
+        """Write everything buffered for a claim, picking up documents added meanwhile"""
+        try:
+            async with self._write_slots:
+                while True:
+                    operations = self._write_buffer.pop(claim_id, None)
+                    if not operations:
+                        break
+                    await self._write_documents(claim_id, operations)
+        finally:
+            # No await since the buffer was found empty, so nothing can be stranded
+            self._flush_tasks.pop(claim_id, None)
+    
+    async def _write_documents(self, claim_id: str, operations: List[Tuple[str, Dict[str, Any]]]) -> None:
+        """Apply (operation, document) writes for one partition, batching when there is more than one"""
+        if len(operations) == 1:
+            operation, document = operations[0]
+            try:
+                if operation == "upsert":
+                    await self.container.upsert_item(body=document)
+                else:
+                    await self.container.create_item(body=document)
+                    logger.debug("[SAVED] Stored %s response for claim %s in Cosmos DB", document['agent_type'], claim_id)
+            except Exception as e:
+                logger.warning("[WARNING] Cosmos DB store failed, using in-memory: %s", e)
+            return
+        
+        for start in range(0, len(operations), MAX_BATCH_OPERATIONS):
+            chunk = operations[start:start + MAX_BATCH_OPERATIONS]
+            try:
+                await self.container.execute_item_batch(
+                    batch_operations=[(operation, (document,)) for operation, document in chunk],
+                    partition_key=claim_id
+                )
+                logger.debug("[SAVED] Stored %s documents for claim %s in Cosmos DB (batch)", len(chunk), claim_id)
+            except Exception as batch_error:
+                logger.warning("[WARNING] Cosmos DB batch write failed, retrying per item: %s", batch_error)
+                for operation in chunk:
+                    await self._write_documents(claim_id, [operation])
+    
+    def _invalidate_retrieve_cache(self, claim_id: str) -> None:
+        """Drop cached retrieve results for a claim so new writes are visible"""
+        for key in [key for key in self._retrieve_cache if key[0] == claim_id]:
+            del self._retrieve_cache[key]
+    
+    async def flush(self, claim_id: Optional[str] = None) -> None:
+        """Wait for pending Cosmos DB writes for a claim (or for all claims)"""
+        if claim_id is None:
+            tasks = list(self._flush_tasks.values())
+        else:
+            task = self._flush_tasks.get(claim_id)
+            tasks = [task] if task else []
+        if tasks:
+            await asyncio.gather(*tasks, return_exceptions=True)
     
+    async def close(self) -> None:
+        """
+        Flush pending writes and close the shared async Cosmos DB client.
+        Call only at process shutdown: other managers share the same client.
+        """
+        await self.flush()
+        self._use_cosmos = False
+        self._connected = True
+        connection_key = (self.cosmos_endpoint, self.database_name, self.container_name)
+        connections = _shared_connections().connections
+        shared = connections.get(connection_key)
+        if shared is not None and shared.client is self.client:
+            del connections[connection_key]
+            await self._close_client()
+        else:
+            self.client = None
+            self.container = None
+            self._credential = None
+
     async def retrieve_previous_responses(
         self, 
         claim_id: str, 
         agent_types: List[str] = None
     ) -> Dict[str, Any]:
-        """Retrieve previous agent responses for a claim"""
-        if not self._use_cosmos or not self.container:
+        """Retrieve previous agent responses for a claim (cached briefly per claim/agent set)"""
+        if not await self.connect():
             return self._in_memory.retrieve(claim_id, agent_types)
         
+        cache_key = (claim_id, tuple(sorted(agent_types)) if agent_types else None)
+        cached = self._retrieve_cache.get(cache_key)
+        if cached is not None:
+            responses, expiry_ns = cached
+            if time.monotonic_ns() < expiry_ns:
+                self._retrieve_cache.move_to_end(cache_key)
+                return dict(responses)
+            del self._retrieve_cache[cache_key]
+        
+        await self.flush(claim_id)  # Read-your-writes for this claim
+        
         try:
-            query = "SELECT * FROM c WHERE c.claim_id = @claim_id"
+            query = _retrieve_sql(len(agent_types) if agent_types else 0)
             parameters = [{"name": "@claim_id", "value": claim_id}]
-            
             if agent_types:
-                placeholders = ', '.join([f"@agent_{i}" for i in range(len(agent_types))])
-                query += f" AND c.agent_type IN ({placeholders})"
-                for i, agent_type in enumerate(agent_types):
-                    parameters.append({"name": f"@agent_{i}", "value": agent_type})
-            
-            query += " ORDER BY c.timestamp ASC"
+                parameters.extend(
+                    {"name": f"@agent_{i}", "value": agent_type}
+                    for i, agent_type in enumerate(agent_types)
+                )
             
-            items = list(self.container.query_items(
+            # No ORDER BY (saves the sort RU); keep the newest row per agent as rows stream in
+            latest: Dict[str, Dict[str, Any]] = {}
+            async for item in self.container.query_items(
                 query=query,
                 parameters=parameters,
-                enable_cross_partition_query=True
-            ))
+                partition_key=claim_id
+            ):
+                previous = latest.get(item["agent_type"])
+                if previous is None or item["timestamp"] > previous["timestamp"]:
+                    latest[item["agent_type"]] = item
             
-            responses = {}
-            for item in items:
-                agent_type = item["agent_type"]
-                responses[agent_type] = {
+            responses = {
+                agent_type: {
                     "response_data": item["response_data"],
                     "extracted_data": item.get("extracted_data", {}),
                     "timestamp": item["timestamp"]
                 }
-            
-            print(f"[LOADED] Retrieved {len(responses)} previous responses for claim {claim_id}")
-            return responses
+                for agent_type, item in sorted(latest.items(), key=lambda entry: entry[1]["timestamp"])
+            }
+            logger.debug("[LOADED] Retrieved %s previous responses for claim %s", len(responses), claim_id)
+            self._retrieve_cache[cache_key] = (responses, time.monotonic_ns() + RETRIEVE_CACHE_TTL_NS)
+            if len(self._retrieve_cache) > RETRIEVE_CACHE_MAX_ENTRIES:
+                self._retrieve_cache.popitem(last=False)
+            return dict(responses)
             
         except Exception as e:
-            print(f"[WARNING] Cosmos DB retrieve failed, using in-memory: {e}")
+            logger.warning("[WARNING] Cosmos DB retrieve failed, using in-memory: %s", e)
             return self._in_memory.retrieve(claim_id, agent_types)
     
     async def get_latest_response(self, claim_id: str, agent_type: str) -> Dict[str, Any]:
         """Get the latest response from a specific agent for a claim"""
-        if not self._use_cosmos or not self.container:
+        if not await self.connect():
             return self._in_memory.get_latest(claim_id, agent_type)
         
+        if claim_id in self._flush_tasks:
+            # Writes still pending: the in-memory copy is the newest, no need to wait for them
+            pending = self._in_memory.get_latest(claim_id, agent_type)
+            if pending:
+                return pending
+            await self.flush(claim_id)  # Read-your-writes for this claim
+        
+        from azure.cosmos.exceptions import CosmosResourceNotFoundError
         try:
-            query = """
-            SELECT TOP 1 * FROM c 
-            WHERE c.claim_id = @claim_id AND c.agent_type = @agent_type 
-            ORDER BY c.timestamp DESC
-            """
-            
-            items = list(self.container.query_items(
-                query=query,
+            # Point read of the latest pointer costs ~1 RU versus a cross-document query
+            item = await self.container.read_item(
+                item=_latest_pointer_id(claim_id, agent_type),
+                partition_key=claim_id
+            )
+            return {
+                "response_data": item["response_data"],
+                "extracted_data": item.get("extracted_data", {}),
+                "timestamp": item["timestamp"]
+            }
+        except CosmosResourceNotFoundError:
+            pass  # Responses stored before pointers existed; fall back to a query
+        except Exception as e:
+            logger.warning("[WARNING] Cosmos DB get_latest failed, using in-memory: %s", e)
+            return self._in_memory.get_latest(claim_id, agent_type)
+        
+        try:
+            async for item in self.container.query_items(
+                query=_LATEST_SQL,
                 parameters=[
                     {"name": "@claim_id", "value": claim_id},
                     {"name": "@agent_type", "value": agent_type}
                 ],
-                enable_cross_partition_query=True
-            ))
-            
-            if items:
+                partition_key=claim_id,
+                max_item_count=1
+            ):
                 return {
-                    "response_data": items[0]["response_data"],
-                    "extracted_data": items[0].get("extracted_data", {}),
-                    "timestamp": items[0]["timestamp"]
+                    "response_data": item["response_data"],
+                    "extracted_data": item.get("extracted_data", {}),
+                    "timestamp": item["timestamp"]
                 }
             return {}
             
         except Exception as e:
-            print(f"[WARNING] Cosmos DB get_latest failed, using in-memory: {e}")
+            logger.warning("[WARNING] Cosmos DB get_latest failed, using in-memory: %s", e)
             return self._in_memory.get_latest(claim_id, agent_type)
     
     async def get_all_agent_responses(self, claim_id: str) -> List[Dict[str, Any]]:
         """Get all agent responses for a specific claim"""
-        if not self._use_cosmos or not self.container:
+        if not await self.connect():
             return self._in_memory.get_all(claim_id)
         
+        await self.flush(claim_id)  # Read-your-writes for this claim
+        
         try:
-            query = """
-            SELECT c.agent_type, c.response_data, c.extracted_data, c.timestamp, c.status
-            FROM c 
-            WHERE c.claim_id = @claim_id 
-            ORDER BY c.timestamp ASC
-            """
-            
-            items = list(self.container.query_items(
-                query=query,
-                parameters=[{"name": "@claim_id", "value": claim_id}],
-                enable_cross_partition_query=True
-            ))
-            
-            return items
+            return [
+                item async for item in self.container.query_items(
+                    query=_ALL_SQL,
+                    parameters=[{"name": "@claim_id", "value": claim_id}],
+                    partition_key=claim_id
+                )
+            ]
             
         except Exception as e:
-            print(f"[WARNING] Cosmos DB get_all failed, using in-memory: {e}")
+            logger.warning("[WARNING] Cosmos DB get_all failed, using in-memory: %s", e)
             return self._in_memory.get_all(claim_id)
@@ -1,12 +1,13 @@
 """
 Data models for claim orchestration
+Slotted dataclasses (no per-instance __dict__); extracted values are immutable
 """
 
 from dataclasses import dataclass
 from typing import Optional
 
 
-@dataclass
+@dataclass(slots=True)
 class ClaimData:
     """Data structure to hold claim information throughout the orchestration process"""
     claim_id: str
@@ -17,7 +18,7 @@ class ClaimData:
     final_recommendation: Optional[str] = None
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExtractedPolicyData:
     """Extracted policy information"""
     idv: int = 0
@@ -25,7 +26,7 @@ class ExtractedPolicyData:
     coverage_eligible: bool = False
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExtractedInspectionData:
     """Extracted inspection information"""
     repair_cost_estimate: int = 0
@@ -33,7 +34,7 @@ class ExtractedInspectionData:
     damage_authentic: bool = False
 
 
-@dataclass
+@dataclass(slots=True, frozen=True)
 class ExtractedBillData:
     """Extracted bill information"""
     actual_bill_amount: int = 0
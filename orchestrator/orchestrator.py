@@ -5,14 +5,21 @@ Coordinates the insurance claim processing workflow
 
 import os
 import asyncio
+import logging
+from concurrent.futures import ThreadPoolExecutor
 from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Tuple
 from dotenv import load_dotenv
+from azure.ai.projects.models import AgentStreamEvent, MessageDeltaChunk, ThreadMessageOptions, ThreadRun
 
 from .models import ClaimData
 from .memory_manager import CosmosMemoryManager
 from .agent_factory import AgentFactory
 from .data_extractors import DataExtractor
 from .synthesis_engine import SynthesisEngine
+from .llm_cache import LLMCache
+from .router import PIPELINES, ClaimCategory, classify_claim
+from .logging_config import configure_logging
 
 # Import audit agent from parent directory
 import sys
@@ -21,11 +28,26 @@ from agents.auditagent import AuditAgent
 
 load_dotenv()
 
+logger = logging.getLogger(__name__)
+
+AUDIT_QUEUE_SIZE = 128
+
+# Each in-flight agent run holds a worker thread while it polls, so the default
+# executor (min(32, cpu_count + 4) threads) would cap how many claims progress at once
+AGENT_WORKER_THREADS = int(os.getenv("AGENT_WORKER_THREADS", str((os.cpu_count() or 1) * 5)))
+
+
+def configure_executor() -> None:
+    """Give the running event loop a default executor sized for blocking agent calls"""
+    asyncio.get_running_loop().set_default_executor(
+        ThreadPoolExecutor(max_workers=AGENT_WORKER_THREADS, thread_name_prefix="agent-io")
+    )
+
 
 class AutoInsuranceOrchestrator:
     """
     Main orchestrator for auto insurance claim processing.
-    Coordinates all agents in sequence with memory persistence.
+    Coordinates all agents with memory persistence, running independent steps concurrently.
     """
     
     def __init__(self):
@@ -35,42 +57,148 @@ class AutoInsuranceOrchestrator:
         self.data_extractor = DataExtractor()
         self.synthesis_engine = SynthesisEngine()
         self.audit_agent = AuditAgent()
+        self.llm_cache = LLMCache()  # No-op unless CLAIM_LLM_CACHE_DIR is set
+        self.routing_enabled = os.getenv("CLAIM_ROUTING", "false").lower() == "true"
+        
+        # Audit records are HTTP calls; a background task sends them off the event loop
+        self._audit_queue: asyncio.Queue = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+        self._audit_task: Optional[asyncio.Task] = None
+        
+        # Extracted data of finished steps for claims inside process_claim, so later steps
+        # skip the memory round-trip; dropped when the claim finishes
+        self._claim_cache: Dict[str, Dict[str, Dict[str, Any]]] = {}
         
         self.instructions_dir = Path(__file__).parent.parent / "instructions"
         
-        print("[OK] Auto Insurance Orchestrator initialized")
+        logger.info("[OK] Auto Insurance Orchestrator initialized")
     
     def _load_instruction(self, filename: str) -> str:
-        """Load instruction template from file"""
-        filepath = self.instructions_dir / filename
-        with open(filepath, "r") as f:
-            return f.read()
+        """Load instruction template from file (read once, shared with the agent factory's cache)"""
+        return self.agent_factory._load_instruction(filename)
+    
+    async def _audit(self, log_method: Callable[..., Any], *args: Any) -> None:
+        """Queue an audit call; waits only if the consumer has fallen AUDIT_QUEUE_SIZE calls behind"""
+        if self._audit_task is None or self._audit_task.done():
+            self._audit_task = asyncio.create_task(self._drain_audit_queue())
+        await self._audit_queue.put((log_method, args))
+    
+    async def _drain_audit_queue(self):
+        """Background consumer: run queued audit calls in a worker thread, in order"""
+        while True:
+            log_method, args = await self._audit_queue.get()
+            try:
+                await asyncio.to_thread(log_method, *args)
+            except Exception as e:
+                logger.warning("[WARNING] Audit log call failed: %s", e)
+            finally:
+                self._audit_queue.task_done()
+    
+    async def flush_audit_log(self):
+        """Wait for queued audit calls to be sent, then stop the consumer"""
+        if self._audit_task is None:
+            return
+        await self._audit_queue.join()
+        self._audit_task.cancel()
+        try:
+            await self._audit_task
+        except asyncio.CancelledError:
+            pass
+        self._audit_task = None
+    
+    def _remember_step(self, claim_id: str, step: str, extracted_data: Dict[str, Any]) -> None:
+        """Keep a step's extracted data for the rest of an in-progress claim"""
+        claim_steps = self._claim_cache.get(claim_id)
+        if claim_steps is not None:
+            claim_steps[step] = extracted_data
+    
+    def _run_agent_query(self, agent_id: str, content: str) -> Tuple[Any, Optional[str]]:
+        """Run a query on a new thread; returns the run and the assistant reply (None if failed)"""
+        agents = self.agent_factory.project_client.agents
+        # Streaming ends as soon as the run does: no status polling and no list_messages call
+        thread = agents.create_thread(messages=[ThreadMessageOptions(role="user", content=content)])
+        run = None
+        reply_parts: List[str] = []
+        with agents.create_stream(thread_id=thread.id, agent_id=agent_id) as stream:
+            for event_type, event_data, _ in stream:
+                if event_type == AgentStreamEvent.THREAD_MESSAGE_CREATED:
+                    reply_parts = []  # Keep only the last assistant message, as before
+                elif isinstance(event_data, MessageDeltaChunk):
+                    reply_parts.append(event_data.text)
+                elif isinstance(event_data, ThreadRun):
+                    run = event_data
+        if run is None or run.status != "completed":
+            return run, None  # Failed, cancelled or expired
+        return run, "".join(reply_parts)
+    
+    async def _query_agent(
+        self,
+        step: str,
+        instructions: str,
+        query: str,
+        upstream: Any,
+        create_agent: Callable[[], Any],
+        pooled: bool = False
+    ) -> Tuple[Optional[str], Optional[str]]:
+        """
+        Run a query on an agent, answering from the LLM cache when possible.
+        Pooled agents (fixed instructions) are reused across claims; others are created
+        for this query and deleted afterwards.
+        Returns (reply, None) on success or (None, error) when the run did not complete.
+        """
+        cache_key = None
+        if self.llm_cache.enabled:
+            cache_key = LLMCache.make_key(step, "gpt-4o", instructions, query, upstream)
+            cached = await asyncio.to_thread(self.llm_cache.get, cache_key)
+            if cached is not None:
+                logger.info("♻️ %s: using cached agent response", step)
+                return cached["result"], None
+        
+        # The agents SDK client is synchronous: every call runs in a worker thread so
+        # other steps and claims keep going on the event loop
+        if pooled:
+            agent_id = await asyncio.to_thread(
+                self.agent_factory.get_or_create_agent, step, instructions, create_agent
+            )
+        else:
+            agent_id = (await asyncio.to_thread(create_agent)).id
+        try:
+            run, result = await asyncio.to_thread(self._run_agent_query, agent_id, query)
+        except Exception:
+            if pooled:
+                await asyncio.to_thread(self.agent_factory.discard_pooled_agent, step, instructions)
+            raise
+        finally:
+            if not pooled:
+                await asyncio.to_thread(self.agent_factory.delete_agent, agent_id)
+        
+        if result is None:
+            if run is None:
+                return None, "stream ended without a run status"
+            # last_error is only set for failed runs; cancelled/expired/incomplete still need an error
+            return None, run.last_error or f"run ended with status {run.status}"
+        if cache_key is not None:
+            await asyncio.to_thread(self.llm_cache.put, cache_key, result)
+        return result, None
     
     async def get_policy_basic_details(self, claim_id: str) -> str:
         """Step 0: Get basic policy details"""
-        print("\n🔍 Step 0: Getting Car Policy Basic Details...")
+        logger.info("\n🔍 Step 0: Getting Car Policy Basic Details...")
         
         try:
-            # Load instructions and create agent
+            # Load instructions; the agent is created only on a cache miss
             instructions = self._load_instruction("policy_lookup_agent.txt")
-            agent = self.agent_factory.project_client.agents.create_agent(
-                model="gpt-4o",
-                name="main-auto-insurance-policy-expert",
-                instructions=instructions,
-                tools=self.agent_factory._create_search_tool(
-                    "policyauto",
-                    {"content": "content", "title": "document_title", 
-                     "source": "document_path", "claim_type": "claim_category"}
-                ).definitions,
-                tool_resources=self.agent_factory._create_search_tool(
-                    "policyauto",
-                    {"content": "content", "title": "document_title", 
-                     "source": "document_path", "claim_type": "claim_category"}
-                ).resources,
-            )
             
-            # Create thread and query
-            thread = self.agent_factory.project_client.agents.create_thread()
+            # Same policyauto index and field mappings as the policy agent, built once by the factory
+            policy_search = self.agent_factory._policy_tool
+            
+            def create_agent():
+                return self.agent_factory.project_client.agents.create_agent(
+                    model="gpt-4o",
+                    name="main-auto-insurance-policy-expert",
+                    instructions=instructions,
+                    tools=policy_search.definitions,
+                    tool_resources=policy_search.resources,
+                )
             
             policy_query = (
                 "Search the policy index and retrieve complete vehicle insurance policy information. "
@@ -82,28 +210,20 @@ class AutoInsuranceOrchestrator:
                 "coverage types (own damage, third party), and key exclusions."
             )
             
-            self.agent_factory.project_client.agents.create_message(
-                thread_id=thread.id, role="user", content=policy_query
+            result, error = await self._query_agent(
+                "main_policy_basic", instructions, policy_query, None, create_agent, pooled=True
             )
             
-            run = self.agent_factory.project_client.agents.create_and_process_run(
-                thread_id=thread.id, agent_id=agent.id
-            )
-            
-            if run.status == "failed":
-                result = f"❌ Policy analysis failed: {run.last_error}"
+            if error is not None:
+                result = f"❌ Policy analysis failed: {error}"
             else:
-                messages = self.agent_factory.project_client.agents.list_messages(thread_id=thread.id)
-                result = messages.get_last_text_message_by_role("assistant").text.value
-                
                 # Store in memory
                 await self.memory_manager.store_agent_response(
                     claim_id, "main_policy_basic", result,
                     {"car_details_extracted": True, "structured_response": True}
                 )
             
-            self.agent_factory.delete_agent(agent.id)
-            print("✅ Policy basic details retrieved")
+            logger.info("✅ Policy basic details retrieved")
             return result
             
         except Exception as e:
@@ -111,37 +231,30 @@ class AutoInsuranceOrchestrator:
     
     async def execute_policy_analysis(self, claim_query: str, claim_id: str) -> str:
         """Step 1: Execute policy coverage analysis"""
-        print("\n🔍 Step 1: Executing Policy Analysis...")
+        logger.info("\n🔍 Step 1: Executing Policy Analysis...")
         
         customer_name = f"Customer-{claim_id.split('-')[-1]}"
-        self.audit_agent.log_process_start(
+        await self._audit(
+            self.audit_agent.log_process_start,
             claim_id, customer_name, "policy_analysis",
             "orchestrator-policy-agent", f"Starting policy analysis: {claim_query[:100]}..."
         )
         
         try:
-            agent = self.agent_factory.create_policy_agent()
-            thread = self.agent_factory.project_client.agents.create_thread()
-            
-            self.agent_factory.project_client.agents.create_message(
-                thread_id=thread.id, role="user",
-                content=f"Analyze policy coverage for: {claim_query.split('totaling')[0] if 'totaling' in claim_query else claim_query}"
+            result, error = await self._query_agent(
+                "policy", self._load_instruction("policy_coverage_agent.txt"),
+                f"Analyze policy coverage for: {claim_query.split('totaling')[0] if 'totaling' in claim_query else claim_query}",
+                None, self.agent_factory.create_policy_agent, pooled=True
             )
             
-            run = self.agent_factory.project_client.agents.create_and_process_run(
-                thread_id=thread.id, agent_id=agent.id
-            )
-            
-            if run.status == "failed":
-                result = f"❌ Policy analysis failed: {run.last_error}"
-                self.audit_agent.log_process_completion(
+            if error is not None:
+                result = f"❌ Policy analysis failed: {error}"
+                await self._audit(
+                    self.audit_agent.log_process_completion,
                     claim_id, customer_name, "policy_analysis",
-                    "orchestrator-policy-agent", f"Failed: {run.last_error}", False
+                    "orchestrator-policy-agent", f"Failed: {error}", False
                 )
             else:
-                messages = self.agent_factory.project_client.agents.list_messages(thread_id=thread.id)
-                result = messages.get_last_text_message_by_role("assistant").text.value
-                
                 # Extract and store
                 extracted_data = {
                     "idv": self.data_extractor.extract_idv_from_policy(result),
@@ -152,20 +265,22 @@ class AutoInsuranceOrchestrator:
                 await self.memory_manager.store_agent_response(
                     claim_id, "policy", result, extracted_data
                 )
+                self._remember_step(claim_id, "policy", extracted_data)
                 
-                self.audit_agent.log_process_completion(
+                await self._audit(
+                    self.audit_agent.log_process_completion,
                     claim_id, customer_name, "policy_analysis",
                     "orchestrator-policy-agent",
                     f"Completed. IDV: ₹{extracted_data['idv']:,}", True
                 )
             
-            self.agent_factory.delete_agent(agent.id)
-            print("✅ Policy analysis completed")
+            logger.info("✅ Policy analysis completed")
             return result
             
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
-            self.audit_agent.log_process_completion(
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_id, customer_name, "policy_analysis",
                 "orchestrator-policy-agent", f"Exception: {str(e)}", False
             )
@@ -173,10 +288,11 @@ class AutoInsuranceOrchestrator:
     
     async def execute_inspection_analysis(self, claim_query: str, claim_id: str) -> str:
         """Step 2: Execute inspection analysis with memory context"""
-        print("\n🔍 Step 2: Executing Inspection Analysis...")
+        logger.info("\n🔍 Step 2: Executing Inspection Analysis...")
         
         customer_name = f"Customer-{claim_id.split('-')[-1]}"
-        self.audit_agent.log_process_start(
+        await self._audit(
+            self.audit_agent.log_process_start,
             claim_id, customer_name, "inspection_assessment",
             "orchestrator-inspection-agent", f"Starting inspection: {claim_query[:100]}..."
         )
@@ -187,47 +303,43 @@ class AutoInsuranceOrchestrator:
             policy_context = policy_memory.get("response_data", "No policy data")
             policy_data = policy_memory.get("extracted_data", {})
             
-            print(f"📖 Using policy context: IDV=₹{policy_data.get('idv', 0):,}")
+            # Format the amounts once for the log line, instructions and query
+            idv_str = f"{policy_data.get('idv', 0):,}"
+            deductible_str = f"{policy_data.get('deductible', 0):,}"
+            
+            logger.info("📖 Using policy context: IDV=₹%s", idv_str)
             
             # Load and customize instructions
             template = self._load_instruction("inspection_orchestrator_agent.txt")
             instructions = template.format(
-                idv=f"{policy_data.get('idv', 0):,}",
-                deductible=f"{policy_data.get('deductible', 0):,}",
+                idv=idv_str,
+                deductible=deductible_str,
                 coverage_eligible=policy_data.get('coverage_eligible', 'Unknown')
             )
             
-            agent = self.agent_factory.create_inspection_agent(instructions)
-            thread = self.agent_factory.project_client.agents.create_thread()
-            
             query = f"""
             Conduct inspection for: {claim_query}
             
             POLICY CONTEXT: {policy_context}
-            IDV: ₹{policy_data.get('idv', 0):,}
-            Deductible: ₹{policy_data.get('deductible', 0):,}
+            IDV: ₹{idv_str}
+            Deductible: ₹{deductible_str}
             
             Assess damage, authenticity, cost estimation.
             """
             
-            self.agent_factory.project_client.agents.create_message(
-                thread_id=thread.id, role="user", content=query
-            )
-            
-            run = self.agent_factory.project_client.agents.create_and_process_run(
-                thread_id=thread.id, agent_id=agent.id
+            result, error = await self._query_agent(
+                "inspection", instructions, query, policy_data,
+                lambda: self.agent_factory.create_inspection_agent(instructions)
             )
             
-            if run.status == "failed":
-                result = f"❌ Inspection failed: {run.last_error}"
-                self.audit_agent.log_process_completion(
+            if error is not None:
+                result = f"❌ Inspection failed: {error}"
+                await self._audit(
+                    self.audit_agent.log_process_completion,
                     claim_id, customer_name, "inspection_assessment",
-                    "orchestrator-inspection-agent", f"Failed: {run.last_error}", False
+                    "orchestrator-inspection-agent", f"Failed: {error}", False
                 )
             else:
-                messages = self.agent_factory.project_client.agents.list_messages(thread_id=thread.id)
-                result = messages.get_last_text_message_by_role("assistant").text.value
-                
                 extracted_data = {
                     "repair_cost_estimate": self.data_extractor.extract_cost_estimate(result),
                     "total_loss_indicated": self.data_extractor.check_total_loss(result),
@@ -238,88 +350,104 @@ class AutoInsuranceOrchestrator:
                 await self.memory_manager.store_agent_response(
                     claim_id, "inspection", result, extracted_data
                 )
+                self._remember_step(claim_id, "inspection", extracted_data)
                 
-                self.audit_agent.log_process_completion(
+                await self._audit(
+                    self.audit_agent.log_process_completion,
                     claim_id, customer_name, "inspection_assessment",
                     "orchestrator-inspection-agent",
                     f"Completed. Estimate: ₹{extracted_data['repair_cost_estimate']:,}", True
                 )
             
-            self.agent_factory.delete_agent(agent.id)
-            print("✅ Inspection analysis completed")
+            logger.info("✅ Inspection analysis completed")
             return result
             
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
-            self.audit_agent.log_process_completion(
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_id, customer_name, "inspection_assessment",
                 "orchestrator-inspection-agent", f"Exception: {str(e)}", False
             )
             return error_msg
     
-    async def execute_bill_reimbursement_analysis(self, claim_query: str, claim_id: str) -> str:
-        """Step 3: Execute bill analysis with full memory context"""
-        print("\n🔍 Step 3: Executing Bill Reimbursement Analysis...")
+    async def execute_bill_reimbursement_analysis(
+        self,
+        claim_query: str,
+        claim_id: str,
+        inspection_assessed: bool = True
+    ) -> str:
+        """
+        Step 3: Execute bill analysis with full memory context.
+        inspection_assessed=False (inspection skipped by routing) leaves the estimate comparison out.
+        """
+        logger.info("\n🔍 Step 3: Executing Bill Reimbursement Analysis...")
         
         customer_name = f"Customer-{claim_id.split('-')[-1]}"
-        self.audit_agent.log_process_start(
+        await self._audit(
+            self.audit_agent.log_process_start,
             claim_id, customer_name, "bill_reimbursement",
             "orchestrator-bill-agent", f"Starting bill analysis: {claim_query[:100]}..."
         )
         
         try:
-            # Retrieve all memory
-            all_memory = await self.memory_manager.retrieve_previous_responses(
-                claim_id, ["policy", "inspection"]
-            )
-            
-            policy_data = all_memory.get("policy", {}).get("extracted_data", {})
-            inspection_data = all_memory.get("inspection", {}).get("extracted_data", {})
+            # Earlier steps of this claim first, memory only for what they don't have
+            known_steps = self._claim_cache.get(claim_id, {})
+            missing_steps = [step for step in ("policy", "inspection") if step not in known_steps]
+            all_memory = {}
+            if missing_steps:
+                all_memory = await self.memory_manager.retrieve_previous_responses(claim_id, missing_steps)
+            
+            policy_data = known_steps.get("policy") or all_memory.get("policy", {}).get("extracted_data", {})
+            inspection_data = known_steps.get("inspection") or all_memory.get("inspection", {}).get("extracted_data", {})
+            
+            # Format the amounts once for the log line, instructions and query
+            idv_str = f"{policy_data.get('idv', 0):,}"
+            deductible_str = f"{policy_data.get('deductible', 0):,}"
+            if inspection_assessed:
+                estimate_str = f"₹{inspection_data.get('repair_cost_estimate', 0):,}"
+                total_loss_str = str(inspection_data.get('total_loss_indicated', False))
+                compare_line = "Compare actual bills vs estimates, calculate reimbursement."
+            else:
+                estimate_str = total_loss_str = "not assessed (minor claim, no inspection)"
+                compare_line = "No inspection estimate exists: assess the bills on their own, calculate reimbursement."
             
-            print(f"📖 Using complete context: IDV=₹{policy_data.get('idv', 0):,}, "
-                  f"Estimate=₹{inspection_data.get('repair_cost_estimate', 0):,}")
+            logger.info("📖 Using complete context: IDV=₹%s, Estimate=%s", idv_str, estimate_str)
             
             # Load and customize instructions
             template = self._load_instruction("bill_reimbursement_orchestrator_agent.txt")
             instructions = template.format(
-                idv=f"{policy_data.get('idv', 0):,}",
-                deductible=f"{policy_data.get('deductible', 0):,}",
-                inspection_estimate=f"{inspection_data.get('repair_cost_estimate', 0):,}",
-                total_loss_status=str(inspection_data.get('total_loss_indicated', False))
+                idv=idv_str,
+                deductible=deductible_str,
+                inspection_estimate=estimate_str,
+                total_loss_status=total_loss_str
             )
             
-            agent = self.agent_factory.create_bill_agent(instructions)
-            thread = self.agent_factory.project_client.agents.create_thread()
-            
             query = f"""
             Analyze actual repair bills for: {claim_query}
             
             COMPLETE CONTEXT:
-            - IDV: ₹{policy_data.get('idv', 0):,}
-            - Deductible: ₹{policy_data.get('deductible', 0):,}
-            - Inspection Estimate: ₹{inspection_data.get('repair_cost_estimate', 0):,}
+            - IDV: ₹{idv_str}
+            - Deductible: ₹{deductible_str}
+            - Inspection Estimate: {estimate_str}
             
-            Compare actual bills vs estimates, calculate reimbursement.
+            {compare_line}
             """
             
-            self.agent_factory.project_client.agents.create_message(
-                thread_id=thread.id, role="user", content=query
+            result, error = await self._query_agent(
+                "bill_synthesis", instructions, query,
+                {"policy_data": policy_data, "inspection_data": inspection_data},
+                lambda: self.agent_factory.create_bill_agent(instructions)
             )
             
-            run = self.agent_factory.project_client.agents.create_and_process_run(
-                thread_id=thread.id, agent_id=agent.id
-            )
-            
-            if run.status == "failed":
-                result = f"❌ Bill analysis failed: {run.last_error}"
-                self.audit_agent.log_process_completion(
+            if error is not None:
+                result = f"❌ Bill analysis failed: {error}"
+                await self._audit(
+                    self.audit_agent.log_process_completion,
                     claim_id, customer_name, "bill_reimbursement",
-                    "orchestrator-bill-agent", f"Failed: {run.last_error}", False
+                    "orchestrator-bill-agent", f"Failed: {error}", False
                 )
             else:
-                messages = self.agent_factory.project_client.agents.list_messages(thread_id=thread.id)
-                result = messages.get_last_text_message_by_role("assistant").text.value
-                
                 extracted_data = {
                     "actual_bill_amount": self.data_extractor.extract_cost_estimate(result),
                     "reimbursement_amount": self.data_extractor.extract_reimbursement_amount(result),
@@ -330,36 +458,60 @@ class AutoInsuranceOrchestrator:
                     claim_id, "bill_synthesis", result, extracted_data
                 )
                 
-                self.audit_agent.log_process_completion(
+                await self._audit(
+                    self.audit_agent.log_process_completion,
                     claim_id, customer_name, "bill_reimbursement",
                     "orchestrator-bill-agent",
                     f"Completed. Reimbursement: ₹{extracted_data['reimbursement_amount']:,}", True
                 )
             
-            self.agent_factory.delete_agent(agent.id)
-            print("✅ Bill analysis completed")
+            logger.info("✅ Bill analysis completed")
             return result
             
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
-            self.audit_agent.log_process_completion(
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_id, customer_name, "bill_reimbursement",
                 "orchestrator-bill-agent", f"Exception: {str(e)}", False
             )
             return error_msg
     
-    async def synthesize_final_recommendation(self, claim_data: ClaimData) -> str:
-        """Step 4: Generate final recommendation"""
-        print("\n🔍 Step 4: Synthesizing Final Recommendation...")
+    async def synthesize_final_recommendation(
+        self,
+        claim_data: ClaimData,
+        on_chunk: Optional[Callable[[str], None]] = None
+    ) -> str:
+        """Step 4: Generate final recommendation (on_chunk receives the LLM reply as it streams)"""
+        logger.info("\n🔍 Step 4: Synthesizing Final Recommendation...")
         
         customer_name = f"Customer-{claim_data.claim_id.split('-')[-1]}"
-        self.audit_agent.log_process_start(
+        await self._audit(
+            self.audit_agent.log_process_start,
             claim_data.claim_id, customer_name, "final_synthesis",
             "claim-orchestrator", "Starting final synthesis"
         )
         
         try:
-            result = await self.synthesis_engine.synthesize_final_recommendation(claim_data)
+            cache_key = None
+            cached = None
+            if self.llm_cache.enabled:
+                # The claim ID is part of the prompt and of the report, so it is part of the key
+                cache_key = LLMCache.make_key(
+                    "final_synthesis", "gpt-4o", self._load_instruction("synthesis_agent.txt"),
+                    claim_data.claim_id,
+                    [claim_data.policy_analysis, claim_data.inspection_results, claim_data.bill_analysis]
+                )
+                cached = await asyncio.to_thread(self.llm_cache.get, cache_key)
+            
+            if cached is not None:
+                logger.info("♻️ final_synthesis: using cached recommendation")
+                result = cached["result"]
+            else:
+                result, from_llm = await self.synthesis_engine.synthesize_with_source(claim_data, on_chunk)
+                # Only LLM reports are cached; a rule-based fallback (e.g. during an outage) is not
+                if cache_key is not None and from_llm:
+                    await asyncio.to_thread(self.llm_cache.put, cache_key, result)
             
             # Store in memory
             await self.memory_manager.store_agent_response(
@@ -367,7 +519,8 @@ class AutoInsuranceOrchestrator:
                 {"synthesis_completed": True, "claim_status": "completed"}
             )
             
-            self.audit_agent.log_process_completion(
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_data.claim_id, customer_name, "final_synthesis",
                 "claim-orchestrator", "Final synthesis completed", True
             )
@@ -376,7 +529,8 @@ class AutoInsuranceOrchestrator:
             
         except Exception as e:
             error_msg = f"❌ Error: {str(e)}"
-            self.audit_agent.log_process_completion(
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_data.claim_id, customer_name, "final_synthesis",
                 "claim-orchestrator", f"Exception: {str(e)}", False
             )
@@ -386,65 +540,118 @@ class AutoInsuranceOrchestrator:
         """
         Main orchestration: processes complete claim through all agents
         """
-        print(f"\n🚀 Starting Claim Processing: {claim_id}")
-        print("=" * 80)
+        logger.info("\n🚀 Starting Claim Processing: %s\n%s", claim_id, "=" * 80)
         
         claim_data = ClaimData(claim_id=claim_id)
         customer_name = f"Customer-{claim_id.split('-')[-1]}"
+        self._claim_cache[claim_id] = {}
         
-        self.audit_agent.log_process_start(
+        await self._audit(
+            self.audit_agent.log_process_start,
             claim_id, customer_name, "claim_processing",
             "claim-orchestrator", f"Starting workflow: {claim_description[:100]}..."
         )
         
         try:
-            # Execute agent pipeline
-            claim_data.basic_policy_details = await self.get_policy_basic_details(claim_id)
-            claim_data.policy_analysis = await self.execute_policy_analysis(claim_description, claim_id)
-            claim_data.inspection_results = await self.execute_inspection_analysis(claim_description, claim_id)
-            
-            print("\n🔧 === REPAIR PHASE ===")
-            print("Customer completes repairs and submits bills...")
-            print("=" * 50)
-            
-            claim_data.bill_analysis = await self.execute_bill_reimbursement_analysis(claim_description, claim_id)
+            category = classify_claim(claim_description) if self.routing_enabled else ClaimCategory.STANDARD
+            steps = PIPELINES[category]
+            if category is not ClaimCategory.STANDARD:
+                logger.info("🧭 Claim routed as %s: running %s", category.value, ", ".join(sorted(steps)) or "policy only")
+            skipped = f"Not required for {category.value.replace('_', ' ')} claims"
+            
+            # Execute agent pipeline. Step 0 and Step 1 are independent and run
+            # concurrently; Step 2 reads Step 1's output from memory so it waits.
+            # The task group cancels the sibling if either fails or the claim is cancelled
+            async with asyncio.TaskGroup() as task_group:
+                basic_details_task = task_group.create_task(self.get_policy_basic_details(claim_id))
+                policy_task = task_group.create_task(self.execute_policy_analysis(claim_description, claim_id))
+            claim_data.basic_policy_details = basic_details_task.result()
+            claim_data.policy_analysis = policy_task.result()
+            if "inspection" in steps:
+                claim_data.inspection_results = await self.execute_inspection_analysis(claim_description, claim_id)
+            else:
+                claim_data.inspection_results = skipped
+            
+            if "bill" not in steps and "inspection" in steps:
+                # Bills are skipped only when inspection confirms the routed total loss
+                inspection_data = self._claim_cache.get(claim_id, {}).get("inspection", {})
+                if not inspection_data.get("total_loss_indicated"):
+                    logger.info("🧭 Inspection did not confirm a %s, running bill analysis", category.value.replace('_', ' '))
+                    steps = steps | {"bill"}
+            
+            if "bill" in steps:
+                logger.info("\n🔧 === REPAIR PHASE ===\nCustomer completes repairs and submits bills...\n%s", "=" * 50)
+                claim_data.bill_analysis = await self.execute_bill_reimbursement_analysis(
+                    claim_description, claim_id, inspection_assessed="inspection" in steps
+                )
+            else:
+                claim_data.bill_analysis = skipped
             claim_data.final_recommendation = await self.synthesize_final_recommendation(claim_data)
             
-            self.audit_agent.log_process_completion(
+            # Make sure background Cosmos DB writes for this claim have landed
+            await self.memory_manager.flush(claim_id)
+            
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_id, customer_name, "claim_processing",
                 "claim-orchestrator", "Complete workflow finished successfully", True
             )
             
-            print("\n" + "=" * 80)
-            print("✅ Claim processing completed successfully!")
+            logger.info("\n%s\n✅ Claim processing completed successfully!", "=" * 80)
             
             return claim_data
             
         except Exception as e:
-            print(f"\n❌ Error in claim processing: {str(e)}")
-            self.audit_agent.log_process_completion(
+            logger.error("\n❌ Error in claim processing: %s", e)
+            await self._audit(
+                self.audit_agent.log_process_completion,
                 claim_id, customer_name, "claim_processing",
                 "claim-orchestrator", f"Failed: {str(e)}", False
             )
             return claim_data
+        
+        finally:
+            self._claim_cache.pop(claim_id, None)
+    
+    async def process_claims_batch(
+        self,
+        claim_specs: List[Tuple[str, str]],
+        max_concurrent: int = 8
+    ) -> List[ClaimData]:
+        """
+        Process several (claim_id, claim_description) claims concurrently on this event loop,
+        at most max_concurrent at a time. Results are returned in input order.
+        """
+        semaphore = asyncio.Semaphore(max_concurrent)
+        
+        async def process_one(claim_id: str, claim_description: str) -> ClaimData:
+            async with semaphore:
+                return await self.process_claim(claim_id, claim_description)
+        
+        return await asyncio.gather(*(process_one(claim_id, description) for claim_id, description in claim_specs))
     
     def cleanup(self):
         """Clean up resources"""
         try:
+            self.agent_factory.cleanup()
             if self.audit_agent:
                 self.audit_agent.cleanup()
-            print("🧹 Orchestrator cleanup completed")
+            logger.info("[INFO] Extraction cache: %s", DataExtractor.cache_stats())
+            logger.info("🧹 Orchestrator cleanup completed")
         except Exception as e:
-            print(f"⚠️ Error during cleanup: {str(e)}")
+            logger.warning("⚠️ Error during cleanup: %s", e)
 
 
 # Main execution
 async def main():
     """Main function to run the orchestrator"""
+    log_listener = configure_logging()
+    configure_executor()
     orchestrator = AutoInsuranceOrchestrator()
     
     try:
-        print("🚀 Auto Insurance Claim Orchestrator Initialized")
+        await orchestrator.memory_manager.connect()
+        logger.info("🚀 Auto Insurance Claim Orchestrator Initialized")
         
         example_claim_id = "CLM-2024-001"
         example_description = """Vehicle collision - front-end accident with bumper, hood damage. 
@@ -452,19 +659,19 @@ async def main():
         
         claim_result = await orchestrator.process_claim(example_claim_id, example_description)
         
-        print("\n📊 COMPLETE CLAIM SUMMARY:")
-        print("=" * 50)
-        print(f"Claim ID: {claim_result.claim_id}")
-        print(f"Status: COMPLETED")
-        print("=" * 50)
+        logger.info("\n📊 COMPLETE CLAIM SUMMARY:\n%s\nClaim ID: %s\nStatus: COMPLETED\n%s",
+                    "=" * 50, claim_result.claim_id, "=" * 50)
         
         if claim_result.final_recommendation:
-            print(f"\n🎯 Final Decision:\n{claim_result.final_recommendation}")
+            logger.info("\n🎯 Final Decision:\n%s", claim_result.final_recommendation)
         
-        print("\n✅ Processing completed!")
+        logger.info("\n✅ Processing completed!")
         
     finally:
+        await orchestrator.flush_audit_log()
+        await orchestrator.memory_manager.close()
         orchestrator.cleanup()
+        log_listener.stop()
 
 
 if __name__ == "__main__":
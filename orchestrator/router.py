@@ -0,0 +1,66 @@
+"""
+Claim Router
+Classifies a claim description so process_claim can skip steps that cannot change the decision
+Opt-in: set CLAIM_ROUTING=true to enable it (otherwise every claim runs the full pipeline)
+"""
+
+import re
+from enum import Enum
+from typing import Dict, FrozenSet
+
+
+class ClaimCategory(str, Enum):
+    """Claim categories with their own pipeline"""
+    MINOR = "minor"
+    STANDARD = "standard"
+    TOTAL_LOSS = "total_loss"
+
+
+# Optional steps each category runs; Steps 0/1 (policy) and synthesis always run.
+# Minor damage is settled on the repair bill alone; a total loss is settled on the
+# IDV once inspection confirms it, so there are no repair bills to analyze
+# (process_claim still runs the bill step when inspection does not confirm it)
+PIPELINES: Dict[ClaimCategory, FrozenSet[str]] = {
+    ClaimCategory.MINOR: frozenset({"bill"}),
+    ClaimCategory.STANDARD: frozenset({"inspection", "bill"}),
+    ClaimCategory.TOTAL_LOSS: frozenset({"inspection"}),
+}
+
+# Vehicle-level phrases only: "burnt smell" or a "fire" in passing is not a total loss
+_TOTAL_LOSS_RE = re.compile(
+    r"total(?:led|\s+loss)|write[\s-]?off|written[\s-]off|(?:burnt|burned)[\s-]out|"
+    r"fire damage|gutted|submerged|beyond repair",
+    re.IGNORECASE
+)
+# A negation up to four words before a match, in the same sentence ("not a total loss",
+# "does not qualify as a total loss"), cancels it
+_NEGATION_RE = re.compile(
+    r"\b(?:not|no|never|isn't|wasn't|aren't|without)\b(?:[^\w.;!?]+\w+){0,4}[^\w.;!?]*$",
+    re.IGNORECASE
+)
+_MINOR_RE = re.compile(
+    r"windshield|windscreen|glass|scratch|minor dent|side mirror|headlight|tail ?light",
+    re.IGNORECASE
+)
+# Any of these means structural damage, so a glass/scratch mention is not enough for MINOR
+_STRUCTURAL_RE = re.compile(
+    r"collision|accident|hood|bonnet|chassis|engine|airbag|frame|pillar",
+    re.IGNORECASE
+)
+
+
+def _mentions_total_loss(description: str) -> bool:
+    """True if a total-loss phrase appears without a negation just before it"""
+    for match in _TOTAL_LOSS_RE.finditer(description):
+        if not _NEGATION_RE.search(description[max(0, match.start() - 60):match.start()]):
+            return True
+    return False
+
+
+def classify_claim(description: str) -> ClaimCategory:
+    """Pick a category from keywords in the claim description (no model call)"""
+    if _mentions_total_loss(description):
+        return ClaimCategory.TOTAL_LOSS
+    if _MINOR_RE.search(description) and not _STRUCTURAL_RE.search(description):
+        return ClaimCategory.MINOR
+    return ClaimCategory.STANDARD
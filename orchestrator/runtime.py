@@ -0,0 +1,22 @@
+"""
+Runtime Detection
+Shared by the Azure OpenAI and Cosmos DB clients so both pick the same credential
+"""
+
+import os
+
+
+# Hosts where managed identity is the only valid credential. Only an explicit
+# RUNTIME_ENV switches to it: a host merely having an identity endpoint may still
+# authenticate through a service principal (EnvironmentCredential)
+MANAGED_IDENTITY_RUNTIMES = {"aks", "aca", "appservice"}
+
+
+def running_with_managed_identity() -> bool:
+    """True when RUNTIME_ENV names a managed-identity host"""
+    return os.getenv("RUNTIME_ENV", "").lower() in MANAGED_IDENTITY_RUNTIMES
+
+
+def runtime_env_set() -> bool:
+    """True when RUNTIME_ENV is set at all (its value then overrides any host detection)"""
+    return bool(os.getenv("RUNTIME_ENV"))
@@ -0,0 +1,29 @@
+"""Amount extraction from agent response lines"""
+
+from orchestrator.data_extractors import DataExtractor
+
+
+def test_multi_number_line_takes_the_amount_not_all_digits():
+    # Digits used to be concatenated across the line, reading 12,500 as 125002
+    text = "Total repair cost: ₹12,500 (2 items)"
+    assert DataExtractor.extract_all(text)["cost"] == 12500
+
+
+def test_multi_number_line_skips_out_of_range_runs():
+    text = "IDV for 2021 model: ₹4,50,000 after 15% depreciation"
+    assert DataExtractor.extract_all(text)["idv"] == 450000
+
+
+def test_each_field_reads_its_own_line():
+    text = (
+        "Insured Declared Value (IDV): ₹5,00,000\n"
+        "Compulsory deductible: ₹2,000 per claim\n"
+        "Total repair cost: ₹45,000 for 3 panels\n"
+        "Approved reimbursement: ₹43,000\n"
+    )
+    assert DataExtractor.extract_all(text) == {
+        "idv": 500000,
+        "deductible": 2000,
+        "cost": 45000,
+        "reimbursement": 43000,
+    }
@@ -0,0 +1,34 @@
+"""Claim router keyword classification"""
+
+import pytest
+
+from orchestrator.router import ClaimCategory, classify_claim
+
+
+@pytest.mark.parametrize("description", [
+    "Car is a total loss after the flood",
+    "Vehicle was written off by the surveyor",
+    "Car burnt out after an engine fire",
+    "Extensive fire damage to the cabin",
+    "No injuries. Total loss after the flood",
+])
+def test_total_loss(description):
+    assert classify_claim(description) is ClaimCategory.TOTAL_LOSS
+
+
+@pytest.mark.parametrize("description", [
+    # Negated
+    "Vehicle is not a total loss, front bumper dent",
+    "Damage does not qualify as a total loss",
+    "Isn't beyond repair, door dent after collision",
+    "No fire damage; rear-ended at a signal",
+    # Incidental
+    "Collision on highway, burnt smell from the engine bay",
+])
+def test_negated_or_incidental_total_loss_is_standard(description):
+    assert classify_claim(description) is ClaimCategory.STANDARD
+
+
+def test_minor_needs_no_structural_damage():
+    assert classify_claim("Windshield cracked by a stone") is ClaimCategory.MINOR
+    assert classify_claim("Windshield cracked in a collision") is ClaimCategory.STANDARD
@@ -4,14 +4,19 @@ import json
 import uuid
 import logging
 import base64
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
 from io import BytesIO
 from pathlib import Path
 from datetime import datetime, timedelta, timezone
+import requests
+from requests.adapters import HTTPAdapter
 from PIL import Image
 from dotenv import load_dotenv
 
 from azure.identity import DefaultAzureCredential, get_bearer_token_provider
 from azure.core.credentials import AzureKeyCredential
+from azure.core.pipeline.transport import RequestsTransport
 from azure.storage.blob import BlobServiceClient, generate_blob_sas, BlobSasPermissions
 from azure.search.documents import SearchClient
 from azure.search.documents.indexes import SearchIndexClient
@@ -39,6 +44,14 @@ STORAGE_ACCOUNT_NAME = os.getenv("STORAGE_ACCOUNT_NAME")
 STORAGE_ACCOUNT_KEY = os.getenv("STORAGE_ACCOUNT_KEY")
 CONTAINER_NAME = os.getenv("CONTAINER_NAME")
 
+# Connections kept per host; the requests default of 10 stalls parallel blob/search calls
+HTTP_POOL_SIZE = 50
+# Files analyzed concurrently; kept below HTTP_POOL_SIZE
+MAX_WORKERS = 16
+# Search upload batch limits (service maximum: 1000 documents / 16 MB per request)
+UPLOAD_BATCH_SIZE = 500
+UPLOAD_BATCH_BYTES = 10 * 1024 * 1024
+
 # Import CU client
 sys.path.append(str(Path(__file__).parent.parent))
 from python.content_understanding_client import AzureContentUnderstandingClient
@@ -53,92 +66,120 @@ client = AzureContentUnderstandingClient(
 )
 
 
-# === Blob Storage Helper Functions ===
-def get_all_customer_documents():
+def pooled_transport():
     """
-    Get all documents from pictures folder in vehicle-insurance container
+    Requests transport with a larger connection pool for the Azure SDK clients.
+    Retries stay with the SDK's own retry policy, so the adapter does not add any.
     """
-    connect_str = f"DefaultEndpointsProtocol=https;AccountName={STORAGE_ACCOUNT_NAME};AccountKey={STORAGE_ACCOUNT_KEY};EndpointSuffix=core.windows.net"
-    blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=HTTP_POOL_SIZE, pool_maxsize=HTTP_POOL_SIZE)
+    session.mount("https://", adapter)
+    return RequestsTransport(session=session, session_owner=True)
 
-    # Get all blobs from the container
-    blobs = container_client.list_blobs()
+
+# === Blob Storage Helper Functions ===
+_blob_service_client = None
+_container_client = None
+_container_client_lock = threading.Lock()
+_user_delegation_key = None
+_user_delegation_key_expiry = None
+_user_delegation_key_lock = threading.Lock()
+
+
+def get_container_client():
+    """
+    Get or create the shared container client, so every listing reuses
+    one connection pool instead of opening a new TLS session
+    """
+    global _blob_service_client, _container_client
     
-    vehicle_docs = {}
-    for blob in blobs:
-        # Skip folders (they end with '/')
-        if blob.name.endswith('/'):
-            continue
-            
-        # Process pictures folder structure: pictures/file.jpg
-        path_parts = blob.name.split('/')
-        
-        if len(path_parts) >= 2 and path_parts[0] == 'pictures':
-            # Structure: pictures/file.jpg
-            doc_type = 'pictures'
-            
-            if 'vehicle-insurance' not in vehicle_docs:
-                vehicle_docs['vehicle-insurance'] = {}
-            if doc_type not in vehicle_docs['vehicle-insurance']:
-                vehicle_docs['vehicle-insurance'][doc_type] = []
-                
-            vehicle_docs['vehicle-insurance'][doc_type].append(blob.name)
+    if _container_client is None:
+        with _container_client_lock:
+            if _container_client is None:
+                # Account key when configured, otherwise the shared DefaultAzureCredential
+                _blob_service_client = BlobServiceClient(
+                    account_url=f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net",
+                    credential=STORAGE_ACCOUNT_KEY or credential,
+                    transport=pooled_transport()
+                )
+                _container_client = _blob_service_client.get_container_client(CONTAINER_NAME)
     
-    return vehicle_docs
+    return _container_client
 
 
 def get_blobs_from_customer_path(customer_id, document_type):
     """
     Retrieve blobs from pictures folder in vehicle-insurance container
     """
-    connect_str = f"DefaultEndpointsProtocol=https;AccountName={STORAGE_ACCOUNT_NAME};AccountKey={STORAGE_ACCOUNT_KEY};EndpointSuffix=core.windows.net"
-    blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-    container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+    container_client = get_container_client()
 
-    # Get all blobs and filter for pictures folder
-    blobs = container_client.list_blobs()
+    # Only names are needed: list them server-side filtered to pictures/ (no blob properties)
     blob_list = []
     
-    for blob in blobs:
+    for blob_name in container_client.list_blob_names(name_starts_with="pictures/"):
         # Skip folders
-        if blob.name.endswith('/'):
+        if blob_name.endswith('/'):
             continue
-            
-        path_parts = blob.name.split('/')
-        
-        # Only check Structure: pictures/file.jpg
-        if len(path_parts) >= 2 and path_parts[0] == 'pictures':
-            blob_list.append(blob.name)
+        blob_list.append(blob_name)
     
     return blob_list
 
 
+def get_user_delegation_key(expiry):
+    """
+    Return a user delegation key valid until at least expiry, for signing SAS URLs
+    without an account key (Managed Identity). One key is shared by all files.
+    """
+    global _user_delegation_key, _user_delegation_key_expiry
+    
+    with _user_delegation_key_lock:
+        if _user_delegation_key_expiry is None or _user_delegation_key_expiry < expiry:
+            get_container_client()
+            start = datetime.now(timezone.utc)
+            key_expiry = expiry + timedelta(hours=1)
+            _user_delegation_key = _blob_service_client.get_user_delegation_key(
+                key_start_time=start,
+                key_expiry_time=key_expiry
+            )
+            _user_delegation_key_expiry = key_expiry
+        return _user_delegation_key
+
+
 def generate_sas_url(file_name):
-    """Generate SAS URL for blob access"""
+    """Generate SAS URL for blob access (account key if configured, else a user delegation key)"""
+    expiry = datetime.now(timezone.utc) + timedelta(hours=1)
+    if STORAGE_ACCOUNT_KEY:
+        signing_key = {"account_key": STORAGE_ACCOUNT_KEY}
+    else:
+        signing_key = {"user_delegation_key": get_user_delegation_key(expiry)}
     sas_token = generate_blob_sas(
         account_name=STORAGE_ACCOUNT_NAME,
         container_name=CONTAINER_NAME,
         blob_name=file_name,
-        account_key=STORAGE_ACCOUNT_KEY,
         permission=BlobSasPermissions(read=True),
-        expiry=datetime.now(timezone.utc) + timedelta(hours=1)
+        expiry=expiry,
+        **signing_key
     )
     blob_url = f"https://{STORAGE_ACCOUNT_NAME}.blob.core.windows.net/{CONTAINER_NAME}/{file_name}?{sas_token}"
     return blob_url
 
 
+DOCUMENT_EXTENSIONS = frozenset({'pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'tiff', 'bmp'})
+AUDIO_EXTENSIONS = frozenset({'mp3', 'wav', 'aac', 'flac', 'm4a'})
+VIDEO_EXTENSIONS = frozenset({'mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv'})
+
+
 def get_file_modality(file_name):
     """
     Determine the modality of a file based on its extension
     """
-    extension = file_name.lower().split('.')[-1]
+    extension = file_name.rpartition('.')[2].lower()
     
-    if extension in ['pdf', 'doc', 'docx', 'txt', 'jpg', 'jpeg', 'png', 'tiff', 'bmp']:
+    if extension in DOCUMENT_EXTENSIONS:
         return 'document'
-    elif extension in ['mp3', 'wav', 'aac', 'flac', 'm4a']:
+    elif extension in AUDIO_EXTENSIONS:
         return 'audio'
-    elif extension in ['mp4', 'avi', 'mov', 'wmv', 'flv', 'mkv']:
+    elif extension in VIDEO_EXTENSIONS:
         return 'video'
     else:
         # Default to document for unknown types
@@ -150,20 +191,19 @@ def list_available_customers_and_types():
     Show available vehicle insurance pictures in the container
     """
     print("\n🔍 Scanning available vehicle insurance pictures...")
-    vehicle_docs = get_all_customer_documents()
     
-    if not vehicle_docs:
+    # Names only: counting needs no blob properties
+    picture_count = len(get_blobs_from_customer_path("vehicle-insurance", "pictures"))
+    
+    if not picture_count:
         print("❌ No vehicle insurance pictures found in pictures/ folder.")
         return
     
     print("\n📊 Available Vehicle Insurance Pictures:")
     print("-" * 40)
-    
-    for folder_name, doc_types in vehicle_docs.items():
-        print(f"🚗 Container: {folder_name}")
-        for doc_type, files in doc_types.items():
-            print(f"   📂 {doc_type} ({len(files)} files)")
-        print()
+    print("🚗 Container: vehicle-insurance")
+    print(f"   📂 pictures ({picture_count} files)")
+    print()
 
 
 def debug_container_contents():
@@ -174,9 +214,7 @@ def debug_container_contents():
     print("-" * 50)
     
     try:
-        connect_str = f"DefaultEndpointsProtocol=https;AccountName={STORAGE_ACCOUNT_NAME};AccountKey={STORAGE_ACCOUNT_KEY};EndpointSuffix=core.windows.net"
-        blob_service_client = BlobServiceClient.from_connection_string(connect_str)
-        container_client = blob_service_client.get_container_client(CONTAINER_NAME)
+        container_client = get_container_client()
 
         # List all blobs
         blobs = container_client.list_blobs()
@@ -202,9 +240,9 @@ def debug_container_contents():
             print(f"\n📊 File structure analysis:")
             folders = set()
             for blob_name in blob_list:
-                parts = blob_name.split('/')
-                if len(parts) > 1:
-                    folders.add('/'.join(parts[:-1]))
+                folder, sep, _ = blob_name.rpartition('/')
+                if sep:
+                    folders.add(folder)
             
             if folders:
                 print("   Detected folder structure:")
@@ -228,9 +266,13 @@ def save_image(image_id: str, analyze_response):
             logging.warning(f"No image data returned for image ID {image_id}")
             return
 
-        image = Image.open(BytesIO(raw_image))
         Path(".cache").mkdir(exist_ok=True)
-        image.save(f".cache/{image_id}.jpg", "JPEG")
+        if raw_image[:3] == b"\xff\xd8\xff":
+            # Already JPEG: write the bytes as-is instead of decoding and re-encoding
+            Path(f".cache/{image_id}.jpg").write_bytes(raw_image)
+        else:
+            image = Image.open(BytesIO(raw_image))
+            image.save(f".cache/{image_id}.jpg", "JPEG")
         logging.info(f"Saved image: .cache/{image_id}.jpg")
     except Exception as e:
         logging.warning(f"Could not fetch image {image_id}: {e}")
@@ -281,7 +323,36 @@ def create_search_index(index_name: str):
         print(f"Index creation skipped or failed: {e}")
 
 
-def process_and_index(modality_name, analyzer_id, file_blob_name, search_client):
+# Analyzer fields copied into each search document under the same name
+ANALYZER_FIELDS = (
+    # Vehicle information
+    "vehicle_make", "vehicle_type", "vehicle_model", "vehicle_color",
+    # Scene and damage detection
+    "scene_type", "damage_detected", "damage_locations", "damage_type",
+    "damage_severity", "damage_description_text",
+    # Specific damage assessment
+    "airbag_status", "glass_damage", "tire_or_wheel_damage", "impact_zone", "tow_required",
+)
+
+
+def get_field_value(fields, field_name, default=""):
+    """Extract an analyzer field value safely"""
+    field_data = fields.get(field_name, {})
+    if field_data.get("type") == "string":
+        return field_data.get("valueString", default)
+    elif field_data.get("type") == "boolean":
+        return field_data.get("valueBoolean", False)
+    elif field_data.get("type") == "array":
+        array_values = field_data.get("valueArray", [])
+        return ", ".join([item.get("valueString", "") for item in array_values if item.get("valueString")])
+    return default
+
+
+def process_and_index(modality_name, analyzer_id, file_blob_name):
+    """
+    Analyze one blob and return its search documents; the caller uploads them
+    in batches across files (see SearchUploadBuffer)
+    """
     print(f"\nProcessing: {file_blob_name} with analyzer: {analyzer_id}")
 
     # Generate SAS URL for the blob
@@ -291,7 +362,8 @@ def process_and_index(modality_name, analyzer_id, file_blob_name, search_client)
     response = client.begin_analyze(analyzer_id, file_location=blob_url)
     result = client.poll_result(response)
 
-    print(json.dumps(result, indent=2))
+    # Full payload only at DEBUG; formatted lazily so INFO runs never serialize it
+    logging.debug("Analyzer result for %s: %s", file_blob_name, result)
 
     documents = []
     keyframe_ids = set()
@@ -302,10 +374,9 @@ def process_and_index(modality_name, analyzer_id, file_blob_name, search_client)
     # Extract folder and document type from blob path
     folder_name = "vehicle-insurance"
     doc_type = "pictures"
-    path_parts = file_blob_name.split('/')
-    if len(path_parts) >= 2 and path_parts[0] == 'pictures':
+    if file_blob_name.startswith('pictures/'):
         folder_name = "vehicle-insurance"
-        doc_type = path_parts[0]
+        doc_type = "pictures"
 
     for idx, item in enumerate(contents):
         content_text = item.get("text") or item.get("transcript") or item.get("markdown") or ""
@@ -329,56 +400,23 @@ def process_and_index(modality_name, analyzer_id, file_blob_name, search_client)
         # Extract vehicle insurance analysis fields
         fields = item.get("fields", {})
         
-        # Helper function to extract field values safely
-        def get_field_value(field_name, default=""):
-            field_data = fields.get(field_name, {})
-            if field_data.get("type") == "string":
-                return field_data.get("valueString", default)
-            elif field_data.get("type") == "boolean":
-                return field_data.get("valueBoolean", False)
-            elif field_data.get("type") == "array":
-                array_values = field_data.get("valueArray", [])
-                return ", ".join([item.get("valueString", "") for item in array_values if item.get("valueString")])
-            return default
-
-        documents.append({
+        document = {
             "id": f"{folder_name}-{doc_type}-{modality_name}-{uuid.uuid4()}",
             "content": content_text,
             "metadata": metadata,
             "segmentDescription": segment_desc,
             
-            # Vehicle information
-            "vehicle_make": get_field_value("vehicle_make"),
-            "vehicle_type": get_field_value("vehicle_type"),
-            "vehicle_model": get_field_value("vehicle_model"),
-            "vehicle_color": get_field_value("vehicle_color"),
-            
-            # Scene and damage detection
-            "scene_type": get_field_value("scene_type"),
-            "damage_detected": get_field_value("damage_detected"),
-            "damage_locations": get_field_value("damage_locations"),
-            "damage_type": get_field_value("damage_type"),
-            "damage_severity": get_field_value("damage_severity"),
-            "damage_description_text": get_field_value("damage_description_text"),
-            
-            # Specific damage assessment
-            "airbag_status": get_field_value("airbag_status"),
-            "glass_damage": get_field_value("glass_damage"),
-            "tire_or_wheel_damage": get_field_value("tire_or_wheel_damage"),
-            "impact_zone": get_field_value("impact_zone"),
-            "tow_required": get_field_value("tow_required"),
-            
             # Document processing fields
             "markdown": markdown_content,
             "file_path": file_blob_name,
             "folder_name": folder_name,
             "document_type": doc_type,
             "analyzer_id": analyzer_id,
-        })
+        }
+        document.update({name: get_field_value(fields, name) for name in ANALYZER_FIELDS})
+        documents.append(document)
 
-    if documents:
-        result_upload = search_client.upload_documents(documents=documents)
-        print(f"Uploaded {len(documents)} documents from {modality_name} - {file_blob_name}")
+    print(f"Extracted {len(documents)} documents from {modality_name} - {file_blob_name}")
 
     for keyframe_id in keyframe_ids:
         try:
@@ -386,6 +424,45 @@ def process_and_index(modality_name, analyzer_id, file_blob_name, search_client)
         except Exception as e:
             logging.warning(f"Failed to save keyframe image {keyframe_id}: {e}")
 
+    return documents
+
+
+class SearchUploadBuffer:
+    """
+    Buffer search documents across files and upload them in as few requests as possible.
+    Azure AI Search accepts up to 1000 documents / 16 MB per request; flushing at
+    UPLOAD_BATCH_SIZE documents or UPLOAD_BATCH_BYTES stays well inside both.
+    """
+
+    def __init__(self, search_client):
+        self.search_client = search_client
+        self.batch = []
+        self.batch_bytes = 0
+        self.uploaded = 0
+        self.failed = 0
+
+    def add(self, documents):
+        for document in documents:
+            self.batch.append(document)
+            self.batch_bytes += len(json.dumps(document))
+            if len(self.batch) >= UPLOAD_BATCH_SIZE or self.batch_bytes >= UPLOAD_BATCH_BYTES:
+                self.flush()
+
+    def flush(self):
+        if not self.batch:
+            return
+        try:
+            results = self.search_client.upload_documents(documents=self.batch)
+            succeeded = sum(1 for result in results if result.succeeded)
+            self.uploaded += succeeded
+            self.failed += len(self.batch) - succeeded
+            print(f"Uploaded {succeeded}/{len(self.batch)} documents to the search index")
+        except Exception as e:
+            self.failed += len(self.batch)
+            logging.warning(f"Failed to upload {len(self.batch)} documents: {e}")
+        self.batch = []
+        self.batch_bytes = 0
+
 
 def get_files_from_blob_storage():
     """
@@ -444,7 +521,12 @@ if __name__ == "__main__":
 
     create_search_index(index_name)
 
-    search_client = SearchClient(endpoint=SEARCH_ENDPOINT, index_name=index_name, credential=AzureKeyCredential(SEARCH_KEY))
+    search_client = SearchClient(
+        endpoint=SEARCH_ENDPOINT,
+        index_name=index_name,
+        credential=AzureKeyCredential(SEARCH_KEY),
+        transport=pooled_transport()
+    )
 
     # Get files from pictures folder in vehicle-insurance container
     files_to_process = get_files_from_blob_storage()
@@ -462,11 +544,34 @@ if __name__ == "__main__":
 
     print(f"\n🚀 Starting to process {len(files_to_process)} vehicle insurance pictures...")
     
+    jobs = []
     for modality, file_blob_name in files_to_process:
         if modality not in analyzer_ids:
             print(f"No analyzer ID found for modality '{modality}'. Skipping file {file_blob_name}.")
             continue
-        analyzer_id = analyzer_ids[modality]
-        process_and_index(modality, analyzer_id, file_blob_name, search_client)
+        jobs.append((modality, analyzer_ids[modality], file_blob_name))
+    
+    # Each file is mostly waiting on the analyzer, so run several at once
+    uploader = SearchUploadBuffer(search_client)
+    failed_files = []
+    with ThreadPoolExecutor(max_workers=MAX_WORKERS) as executor:
+        futures = {
+            executor.submit(process_and_index, modality, analyzer_id, file_blob_name): file_blob_name
+            for modality, analyzer_id, file_blob_name in jobs
+        }
+        for future in as_completed(futures):
+            try:
+                uploader.add(future.result())
+            except Exception as e:
+                failed_files.append(futures[future])
+                logging.warning(f"Failed to process {futures[future]}: {e}")
+    uploader.flush()
+
+    if failed_files or uploader.failed:
+        print(f"❌ {len(failed_files)} of {len(jobs)} files failed to process and "
+              f"{uploader.failed} documents failed to upload ({uploader.uploaded} indexed).")
+        for file_blob_name in failed_files:
+            print(f"   - {file_blob_name}")
+        sys.exit(1)
 
     print("🎯 All vehicle insurance pictures extracted and indexed successfully from blob storage.")